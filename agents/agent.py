@@ -3,7 +3,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from components.game import * 
 from components.frame import Agent, AgentFunctionCallingActionLanguage, AgentRegistry, ActionContext
-from components.model import generate_response
+from components.model import agenerate_response, astream_response, remember_response
+from config import LLM_STREAMING, PROMPT_CACHE_CONTROL
 
 
 """
@@ -24,9 +25,9 @@ SYSTEM_PROMPTS = [
     "3. In addition, different from the normal Tic-Tac-Toe game, if a player has already marked four cells on the canva, the oldest cell will be removed after the new move is implemented. That means you would have at most four icons on the canva.",
     "Your goal is to win the game according to the difficulty level set. If it is set 'hard', be extremely smart and do not let the human player win. Otherwise if it is set 'easy', be mercy with the human player.",
     "After each move by the human, you will receive the most current state of the canva.", 
-    "The canva is represented as a two dimensional array: [[x, x, x, x], [x, x, x, x], [x, x, x, x], [x, x, x, x]]. Value 0 means empty, 1 means human player, 2 means you. Negative number means it is going to be removed in the next round.",
+    "The canva is given as 4 rows of 4 cells separated by '/', top row first, e.g. 'X.O./..x./..../O..o' (row 0 is 'X.O.'). '.' means empty, 'X' means human player, 'O' means you. A lowercase mark is going to be removed in the next round.",
     "You would be also given a tool for you to tell the system which cell you would like to put icon on next. Execute it every round." ,
-    "You are not allowed to mark the cell that is already marked (1 or 2)."
+    "You are not allowed to mark the cell that is already marked ('X' or 'O', in either case)."
     
 ]
 """
@@ -43,7 +44,7 @@ action_registry = ActionRegistry()
 goals = [
     Goal(system_prompt) for system_prompt in SYSTEM_PROMPTS
 ]
-language = AgentFunctionCallingActionLanguage()
+language = AgentFunctionCallingActionLanguage(cache_control=PROMPT_CACHE_CONTROL)
 environment = Environment()
 
 
@@ -51,15 +52,19 @@ environment = Environment()
 # * Tool Registration
 @action_registry.register_tool(
     tool_name="implement_next_move",
-    description="Implement your next move of the tic-tac-toe game. You need to provide the row and column index of the cell you want to mark. The row and column index should be between 0 and 2.",
+    description="Implement your next move of the tic-tac-toe game. You need to provide the row and column index of the cell you want to mark. The row and column index should be between 0 and 3.",
     terminal=True)
 def ai_move(action_context, row: int, col: int):
+    if not (0 <= row < 4 and 0 <= col < 4):
+        raise ValueError(f"Cell [{row}, {col}] is outside the canva: row and column must be between 0 and 3.")
     game = action_context.get("game")
     winner = game.make_move(row, col, 2)
     if winner == 1:
         return f"Game over! Human wins!"
     elif winner == 2:
         return f"Game over! You win!"
+    elif game.engine.draw:
+        return f"Game over! It is a draw."
     else:
         return f"Implemented a move at [{row}, {col}]"
 
@@ -73,4 +78,5 @@ def ai_move(action_context, row: int, col: int):
 
 # ----------------------------------------------------------
 # * Agent Creation
-agent = Agent("agent", goals, language, action_registry, generate_response, environment)
+agent = Agent("agent", goals, language, action_registry, astream_response if LLM_STREAMING else agenerate_response, environment,
+              remember_response=remember_response)
@@ -1,13 +1,107 @@
-from agents.agent import agent
 from components.game import ActionContext, Memory, Goal
 from components.frame import AgentRegistry, Agent
-from config import MAX_HISTORY
+from components.cache import ResponseCache
+from config import (MAX_HISTORY, SEARCH_DEPTH, SEARCH_TIME_BUDGET_MS, SEARCH_TT_ENTRIES, SOLVED_TABLE_PATH,
+                    RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_PATH)
+from engine.board import to_coords
+from engine.providers import MoveProvider, SearchProvider, TableProvider
+from engine.speculate import Speculator
+from engine.symmetry import INVERSE, canonical_key, transform_cell
+from engine.table import open_table
+from utils_st import add_global_memory, lazy_import
 
 import streamlit as st 
+import logging
+import threading
+import time
 
 
+logger = logging.getLogger(__name__)
 
 
+# Moves of the LLM agent by (difficulty, canonical position), shared by every session.
+# The eight symmetric images of a position share one entry; the move is stored in the canonical frame.
+# It has its own table, so it never shares rows (or a purge) with the response cache in the same file.
+position_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_PATH, table="positions")
+
+
+@st.cache_resource(show_spinner=False)
+def load_agent() -> Agent:
+    """
+    The LLM agent with its action registry and tool schemas, built once per process and shared by every session.
+    Importing it loads litellm (about 4 s), so it is loaded on first use (see prefetch_agent) instead of at startup,
+    and Play-with-Human mode and the Search backend never wait for it.
+    """
+    return lazy_import("agents.agent").agent
+
+
+def _prefetch_agent() -> None:
+    try:
+        load_agent()
+        lazy_import("pandas")     # the Memory tab shows the agent's transcript
+    except Exception:
+        # e.g. a missing API key: reported at startup, and the LLM turns fall back to the native engine
+        logger.exception("Loading the LLM agent failed")
+
+
+_agent_prefetch: threading.Thread | None = None
+
+
+def prefetch_agent() -> None:
+    """
+    Start loading the LLM agent in a background thread, once per process (from the first script run, whatever the mode),
+    so the first LLM turn does not wait for it and a broken setup is reported at startup.
+    """
+    global _agent_prefetch
+    if _agent_prefetch is None:
+        # not a daemon: a shutdown during the imports waits for them, instead of finalizing half-imported modules
+        _agent_prefetch = threading.Thread(target=_prefetch_agent, name="agent-prefetch")
+        _agent_prefetch.start()
+
+
+def make_move_provider(difficulty: str) -> MoveProvider:
+    """Native move provider for a difficulty. 'hard' plays from the solved table when it exists."""
+    table = open_table(SOLVED_TABLE_PATH) if difficulty == "hard" else None
+    if table is not None:
+        return TableProvider(table)
+    return SearchProvider(SEARCH_DEPTH[difficulty], SEARCH_TIME_BUDGET_MS, SEARCH_TT_ENTRIES)
+
+
+def get_move_provider(difficulty: str) -> MoveProvider:
+    """
+    Session move provider for a difficulty.
+    Providers are kept for the whole session, so the search reuses its transposition table between moves.
+    """
+    if "move_providers" not in st.session_state:
+        st.session_state['move_providers'] = {}
+
+    providers = st.session_state['move_providers']
+    if difficulty not in providers:
+        providers[difficulty] = make_move_provider(difficulty)
+    return providers[difficulty]
+
+
+def get_speculator(difficulty: str) -> Speculator:
+    """Session speculator for a difficulty, with its own provider (it runs in a background thread)"""
+    if "speculators" not in st.session_state:
+        st.session_state['speculators'] = {}
+
+    speculators = st.session_state['speculators']
+    if difficulty not in speculators:
+        speculators[difficulty] = Speculator(make_move_provider(difficulty))
+    return speculators[difficulty]
+
+
+def agent_query(engine) -> str:
+    """The LLM agent's task for a turn: the current canva in the compact encoding"""
+    return f"Current canva: {engine.to_compact()}. Implement your next move."
+
+
+def speculate_ai_replies():
+    """While the human is choosing, precompute the native AI's reply to each of their moves"""
+    if st.session_state['ai_backend'] == "Search":
+        get_speculator(st.session_state['difficulty']).start(st.session_state['engine'])
+
     
 def AI_PLAYER_MOVE(action_context):
     """
@@ -18,17 +112,78 @@ def AI_PLAYER_MOVE(action_context):
     """
     # * set difficulty
     difficulty = st.session_state['difficulty']
-    agent.goals.append(Goal(f"[Important] The difficulty level is {difficulty}."))
 
-    # * get current canva
-    canva = st.session_state['game_state']
-    query = f"The current canva is {canva}. Please implement your next move."
+    # * native backend: the difficulty sets the search depth
+    if st.session_state['ai_backend'] == "Search":
+        game = action_context.get("game")
+        engine = st.session_state['engine']
+        speculator = get_speculator(difficulty)
+        cell = speculator.take(engine)
+        if cell is None:
+            cell = get_move_provider(difficulty).choose_move(engine)
+        game.make_move(*to_coords(cell), 2)
+        if action_context.debug:
+            st.caption(f"Speculative replies: {speculator.hits} hits / {speculator.misses} misses")
+        return
+
+    # * LLM backend: the agent and the LLM client are loaded in the background from the first run (see prefetch_agent)
+    game = action_context.get("game")
+    engine = st.session_state['engine']
+    try:
+        with st.spinner("Loading the AI agent..."):
+            agent = load_agent()
+    except Exception as e:
+        # * e.g. no API key: the native engine plays instead
+        st.toast(f"The LLM agent could not be loaded ({e}). The native engine played this move.", 
+                 icon=":material/error:")
+        game.make_move(*to_coords(get_move_provider(difficulty).choose_move(engine)), 2)
+        return
+    from components.model import LLMUnavailable, llm_client, response_cache
+
+    # * a position already answered at this difficulty (up to symmetry) skips the agent
+    canonical, transform = canonical_key(engine.state)
+    cache_key = f"{difficulty}:{canonical}"
+    cached = position_cache.get(cache_key)
+    if cached is not None:
+        cell = transform_cell(int(cached), INVERSE[transform])
+        if not engine.state.occupied >> cell & 1:
+            add_global_memory(agent.name, {"role": "assistant", 
+                                           "content": f"Position cache: implemented a move at {list(to_coords(cell))}", 
+                                           "time": f"{time.time()}"})
+            game.make_move(*to_coords(cell), 2)
+            return
+    moves_before = engine.moves_played
+
+    query = agent_query(engine)
 
     with st.spinner("AI thinking..."):
-        st.session_state.shared_memory = agent.run(
-                                    query, 
-                                    memory=st.session_state.shared_memory, 
-                                    action_context=action_context, 
-                                    debug=action_context.debug,
-                                    ui_option=action_context.ui_option
-                                )
\ No newline at end of file
+        try:
+            st.session_state.shared_memory = agent.run(
+                                        query, 
+                                        memory=st.session_state.shared_memory, 
+                                        action_context=action_context, 
+                                        debug=action_context.debug,
+                                        ui_option=action_context.ui_option,
+                                        goals=[Goal(f"[Important] The difficulty level is {difficulty}.")]
+                                    )
+        except LLMUnavailable as e:
+            # * the LLM missed its deadline: the native engine plays this move instead
+            if engine.moves_played == moves_before:
+                st.toast(f"{e} The native engine played this move.", icon=":material/timer_off:")
+                cell = get_move_provider(difficulty).choose_move(engine)
+                game.make_move(*to_coords(cell), 2)
+            return
+
+    # * remember the agent's move in the canonical frame
+    if engine.moves_played == moves_before + 1:
+        cell = engine.state.moves(2)[-1]
+        position_cache.put(cache_key, str(transform_cell(cell, transform)))
+
+    if action_context.debug:
+        for label, cache in (("Response cache", response_cache), ("Position cache", position_cache)):
+            stats = cache.stats()
+            st.caption(f"{label}: {stats['hits']} hits / {stats['misses']} misses "
+                       f"({stats['hit_rate']:.0%}), {stats['entries']} entries")
+        stats = llm_client.stats()
+        st.caption(f"LLM client: {stats['calls']} calls, {stats['retried']} retries, "
+                   f"{stats['hedged']} hedged ({stats['hedge_wins']} won), {stats['timeouts']} timeouts")
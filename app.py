@@ -1,15 +1,14 @@
 import streamlit as st
 import numpy as np
 
-from utils_st import render_sidebar, render_global_memory
+from utils_st import render_sidebar, render_global_memory, rerun_fragment, freeze_startup_objects, MemoryTable
 from tictactoe import TicTacToe_GAME, initialize_session_state
 
 
 from components.game import ActionContext, Memory
 from config import MAX_HISTORY
 from components.frame import AgentRegistry
-from ai_player import AI_PLAYER_MOVE
-
+from ai_player import AI_PLAYER_MOVE, speculate_ai_replies, prefetch_agent
 
 
 st.set_page_config(page_title = "Upgraded Tic-Tac-Toe", 
@@ -23,6 +22,10 @@ st.set_page_config(page_title = "Upgraded Tic-Tac-Toe",
 - Developed by - **[Wally, Huang Lin Chun](https://antique-turn-ad4.notion.site/Wally-Huang-Lin-Chun-182965318fa7804c86bdde557fa376f4)**"""
     })
 
+freeze_startup_objects()
+# * start loading the LLM agent in the background, as early as possible (first run of the process only)
+prefetch_agent()
+
 with open("style.css", "r") as f:
     st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html = True)
 
@@ -42,12 +45,14 @@ with st.expander("Rules"):
 initialize_session_state()
 if "difficulty" not in st.session_state:
     st.session_state['difficulty'] = "easy"
+if "ai_backend" not in st.session_state:
+    st.session_state['ai_backend'] = "LLM"
 if "debug_mode" not in st.session_state:
     st.session_state['debug_mode'] = False
 if "shared_memory" not in st.session_state:
     st.session_state.shared_memory = Memory(max_history=MAX_HISTORY)
 if "global_memory" not in st.session_state:
-    st.session_state["global_memory"] = []
+    st.session_state["global_memory"] = MemoryTable()
 
 
 # * sidebar
@@ -63,50 +68,56 @@ action_context = ActionContext(agent_registry = registry,
                                properties = {"game": game})
 
 
-# * Render player
-if not st.session_state['winner']:
-    st.subheader(f"It's your move, player {st.session_state['current_player']}")
-else:
-    st.subheader(f"GAME OVER!")
-
-
-
-GAME_TAB, HISTORY_TAB, MEMORY_TAB = st.tabs(["Game","Game History",  "Memory"])
-
-
-# * Game board
-with GAME_TAB:
-    game.main()
-
-    # * AI play if the player is 2 and the mode is Play with AI
-    if ((st.session_state['current_player'] == 2) 
-        and (not st.session_state['winner'])
-        and (st.session_state['play_mode'] == "Play with AI")
-        ):
-        AI_PLAYER_MOVE(action_context)
-        st.rerun()
-
-    if st.session_state['winner']:
-        with st.container():
-            if st.button("Start over", width = "stretch", type = "primary"):
-                for _ in st.session_state:
-                    del st.session_state[_]
-                st.rerun()
-            
-
-with MEMORY_TAB:
-    render_global_memory()
-
-with HISTORY_TAB:
-    if not st.session_state['winner']:
-        st.warning("The game is not ending yet!")
-    else:
-        st.header(":material/history_2: Game History")
-
-        @st.fragment
-        def HISTORY():
-            game.render_history()
-        HISTORY()
-
-
-
+# * Tabs, game board, status line and AI turn: a move reruns this fragment only, not the whole app.
+# * The Memory and Game History tabs are in the fragment too, so they show the agent's rows and the end of the game.
+@st.fragment
+def GAME():
+    GAME_TAB, HISTORY_TAB, MEMORY_TAB = st.tabs(["Game","Game History",  "Memory"])
+
+    with GAME_TAB:
+        # * Render player
+        if not st.session_state['game_over']:
+            st.subheader(f"It's your move, player {st.session_state['current_player']}")
+        else:
+            st.subheader(f"GAME OVER!")
+
+        game.main()
+
+        # * AI play if the player is 2 and the mode is Play with AI
+        if ((st.session_state['current_player'] == 2) 
+            and (not st.session_state['game_over'])
+            and (st.session_state['play_mode'] == "Play with AI")
+            ):
+            AI_PLAYER_MOVE(action_context)
+            rerun_fragment()
+
+        # * while the human is choosing, the AI prepares its replies in the background
+        if ((st.session_state['current_player'] == 1) 
+            and (not st.session_state['game_over'])
+            and (st.session_state['play_mode'] == "Play with AI")
+            ):
+            speculate_ai_replies()
+
+        if st.session_state['game_over']:
+            with st.container():
+                if st.button("Start over", width = "stretch", type = "primary"):
+                    for _ in st.session_state:
+                        del st.session_state[_]
+                    st.rerun()
+
+    with MEMORY_TAB:
+        render_global_memory()
+
+    with HISTORY_TAB:
+        if not st.session_state['game_over']:
+            st.warning("The game is not ending yet!")
+        else:
+            st.header(":material/history_2: Game History")
+
+            @st.fragment
+            def HISTORY():
+                game.render_history()
+            HISTORY()
+
+
+GAME()
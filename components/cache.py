@@ -0,0 +1,165 @@
+"""Content-addressed response cache for LLM calls: normalized prompt keys, LRU + TTL eviction, optional SQLite backing"""
+
+from collections import OrderedDict
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from components.game import Prompt
+
+
+# keys that change on every call without changing what the prompt asks for
+VOLATILE_KEYS = {"id", "tool_call_id", "time", "timestamp"}
+
+
+def _strip_volatile(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {k: _strip_volatile(v) for k, v in value.items() if k not in VOLATILE_KEYS}
+    if isinstance(value, list):
+        return [_strip_volatile(v) for v in value]
+    return value
+
+
+def _normalize_content(content: Any) -> Any:
+    """Tool results are stored as JSON strings; parse them so their timestamps can be dropped"""
+    if isinstance(content, str) and content.startswith("{") and content.endswith("}"):
+        try:
+            return _strip_volatile(json.loads(content))
+        except json.JSONDecodeError:
+            return content
+    return content
+
+
+def _normalize_tool_calls(tool_calls: Any) -> Optional[List[Dict]]:
+    """Keep only the function name and arguments of each tool call (objects or dicts)"""
+    if not tool_calls:
+        return None
+    normalized = []
+    for call in tool_calls:
+        function = call.get("function") if isinstance(call, dict) else getattr(call, "function", None)
+        name = function.get("name") if isinstance(function, dict) else getattr(function, "name", None)
+        arguments = function.get("arguments") if isinstance(function, dict) else getattr(function, "arguments", None)
+        try:
+            arguments = json.loads(arguments) if isinstance(arguments, str) else arguments
+        except json.JSONDecodeError:
+            pass
+        normalized.append({"name": name, "arguments": arguments})
+    return normalized
+
+
+def prompt_key(model: str, prompt: Prompt) -> str:
+    """
+    Hash of everything that determines the LLM's answer: model, messages (goals, memory window, canva) and tools.
+    Tool-call ids and timestamps are left out, so the same position asked twice gives the same key.
+    """
+    messages = [
+        {
+            "role": message.get("role"),
+            "content": _normalize_content(message.get("content")),
+            "tool_calls": _normalize_tool_calls(message.get("tool_calls")),
+        }
+        for message in prompt.messages
+    ]
+    payload = {"model": model, "messages": messages, "tools": prompt.tools or None}
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """
+    Thread-safe key -> text cache shared by every session of the server process.
+
+    :param max_entries: entries kept in memory; the least recently used one is evicted first
+    :param ttl_seconds: entries older than this are treated as missing (0 keeps them forever)
+    :param path: optional SQLite file that keeps entries across restarts (None: memory only)
+    :param table: SQLite table of this cache, so several caches can share one file without touching each other's rows
+    :param clock: source of the entries' creation times (seconds)
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600, path: Optional[str] = None,
+                 table: str = "responses", clock: Callable[[], float] = time.time) -> None:
+        if not table.isidentifier():
+            raise ValueError(f"Invalid table name: {table!r}")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self.table = table
+        self.clock = clock
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()     # key -> (created, value)
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(f"CREATE TABLE IF NOT EXISTS {table} (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            if ttl_seconds:
+                self._db.execute(f"DELETE FROM {table} WHERE created < ?", (clock() - ttl_seconds,))
+            self._db.commit()
+        self.clear_stats()
+
+    def clear_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0                 # misses caused by the TTL
+        self.evictions = 0               # entries dropped from memory by the LRU bound
+
+    def _is_fresh(self, created: float) -> bool:
+        return not self.ttl_seconds or self.clock() - created < self.ttl_seconds
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self._db is not None:
+                row = self._db.execute(f"SELECT created, value FROM {self.table} WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    entry = tuple(row)
+                    self._insert(key, entry)
+
+            if entry is None:
+                self.misses += 1
+                return None
+            if not self._is_fresh(entry[0]):
+                self._entries.pop(key, None)
+                self.expired += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: str) -> None:
+        created = self.clock()
+        with self._lock:
+            self._insert(key, (created, value))
+            if self._db is not None:
+                self._db.execute(f"INSERT OR REPLACE INTO {self.table} (key, value, created) VALUES (?, ?, ?)",
+                                 (key, value, created))
+                self._db.commit()
+
+    def _insert(self, key: str, entry: tuple) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.commit()
+        self.clear_stats()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
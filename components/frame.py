@@ -1,9 +1,14 @@
-from components.game import Goal, Prompt, Action, ActionRegistry, Memory, Environment, AgentFunctionCallingActionLanguage, ActionContext
-from utils_st import add_global_memory
+from components.game import Goal, Prompt, PromptPrefix, Action, ActionRegistry, Memory, Environment, AgentFunctionCallingActionLanguage, ActionContext
+from utils_st import add_global_memory, TextStream
 
+import asyncio
+import inspect
 import json
+import threading
 import time
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 from typing import List, Callable, Dict, Any, Tuple, Optional
  
 
@@ -15,29 +20,45 @@ class Agent:
         goals: List[Goal],
         agent_language: AgentFunctionCallingActionLanguage,
         action_registry: ActionRegistry,
-        generate_response: Callable[[Prompt], str],
+        generate_response: Callable[[Prompt], Any],
         environment: Environment,
-        tags = None
+        tags = None,
+        remember_response: Callable[[Prompt, Any], None] | None = None
     ):
         """
         Initialize an agent with its core GAME components
+
+        :param generate_response: LLM function, either blocking or a coroutine function (preferred by 'arun').
+                                  If it takes an 'on_text' callback, the LLM text is streamed to the UI as it arrives
+                                  (and 'on_reset', if it takes one, clears the text of a failed attempt).
+        :param remember_response: called with the prompt and the LLM response once its tool ran without error,
+                                  e.g. to cache it (a response whose action failed is never reused)
         """
         self.name = name
         self.goals = goals
         self.generate_response = generate_response
+        parameters = inspect.signature(generate_response).parameters
+        self.streams_text = "on_text" in parameters
+        self.resets_text = "on_reset" in parameters
         self.agent_language = agent_language
         self.actions = action_registry
         self.environment = environment
         self.tags = tags
+        self.remember_response = remember_response
+        self._prefix_key = None
+        self._prefix: PromptPrefix | None = None
 
-    def construct_prompt(self, goals: List[Goal], memory: Memory, actions: ActionRegistry) -> Prompt:
-        """Build prompt with memory context"""
-        return self.agent_language.construct_prompt(
-            actions=actions.get_actions(self.tags),
-            environment=self.environment,
-            goals=goals,
-            memory=memory
-        )
+    def prompt_prefix(self, goals: List[Goal], actions: ActionRegistry) -> PromptPrefix:
+        """System messages and tool schemas, rebuilt only when the goals, the registered actions or the tags change"""
+        key = (tuple(goals), id(actions), actions.version, tuple(self.tags or ()))
+        if key != self._prefix_key:
+            self._prefix = self.agent_language.format_prefix(actions.get_actions(self.tags), goals)
+            self._prefix_key = key
+        return self._prefix
+
+    def construct_prompt(self, goals: List[Goal], memory: Memory, actions: ActionRegistry, overlay: List[Goal] | None = None) -> Prompt:
+        """Build prompt with memory context, after the cached static prefix and the goals of this run ('overlay')"""
+        return self.agent_language.assemble_prompt(self.prompt_prefix(goals, actions), memory, overlay)
 
     def get_action(self, response):
         invocation = self.agent_language.parse_response(response)
@@ -62,7 +83,7 @@ class Agent:
 
     def set_current_task(self, memory: Memory, task: str):
         """Inject the user's initial request into memory"""
-        memory.add_memory({"role": "user", "content": task})
+        memory.add_memory({"role": "user", "content": task}, task=True)
 
     def set_current_task_global(self, content: str):
         """update the task to global memories (session_state)"""
@@ -77,6 +98,8 @@ class Agent:
         
         :param result: A dictionary (either the LLM response or the result of funcion calls)
         :param role: Role (if LLM response -> 'assistant', elif result of function calls -> 'user')
+
+        Results are stored in the minimal form sent to the LLM (the global memory keeps the full result for the UI).
         """
         assert role in ['user', 'assistant'], "role must be 'user' or 'assistant'"
         if role == "assistant":
@@ -89,7 +112,7 @@ class Agent:
 
             memory.add_memory(assistant_mem)
         else:
-            memory.add_memory({"role": "user", "content": json.dumps(result)})
+            memory.add_memory({"role": "user", "content": self.agent_language.format_result(result)})
 
 
     
@@ -113,13 +136,23 @@ class Agent:
             add_global_memory(self.name, assistant_mem)
         else:
             add_global_memory(self.name, {"role": role, 
-                                          "content": json.dumps(result),
+                                          "content": json.dumps(result, default=str),
                                           "time": f"{time.time()}"})
 
     def prompt_llm_for_action(self, full_prompt: Prompt) -> str:
         """Call the provided LLM function"""
         response = self.generate_response(full_prompt)
         return response
+
+    async def aprompt_llm_for_action(self, full_prompt: Prompt, on_text: Callable[[str], None] | None = None,
+                                     on_reset: Callable[[], None] | None = None) -> Any:
+        """Await the provided LLM function. A blocking one runs in a worker thread, so the event loop is never blocked"""
+        kwargs = {"on_text": on_text} if self.streams_text else {}
+        if self.resets_text:
+            kwargs["on_reset"] = on_reset
+        if inspect.iscoroutinefunction(self.generate_response):
+            return await self.generate_response(full_prompt, **kwargs)
+        return await asyncio.to_thread(self.generate_response, full_prompt, **kwargs)
     
     def debugging(self, ui_option, message):
         if ui_option == "streamlit":
@@ -127,9 +160,33 @@ class Agent:
         else:
             print(message)
 
-    def run(self, user_input: str, memory=None, max_iterations: int = 50, action_context: ActionContext | None = None, debug = False, ui_option = "cli") -> Memory:
+    def run(self, user_input: str, memory=None, max_iterations: int = 50, action_context: ActionContext | None = None, debug = False, ui_option = "cli", goals: List[Goal] | None = None) -> Memory:
+        """
+        Blocking wrapper around 'arun' for callers without an event loop (Streamlit callbacks, the cli).
+        If an event loop is already running in this thread, the loop runs in a helper thread instead.
+        """
+        coroutine = self.arun(user_input, memory, max_iterations, action_context, debug, ui_option, goals)
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(coroutine)
+
+        # tools call Streamlit, so the helper thread gets this script run's context
+        ctx = get_script_run_ctx(suppress_warning=True)
+        def run_in_thread() -> Memory:
+            add_script_run_ctx(threading.current_thread(), ctx)
+            return asyncio.run(coroutine)
+
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(run_in_thread).result()
+
+    async def arun(self, user_input: str, memory=None, max_iterations: int = 50, action_context: ActionContext | None = None, debug = False, ui_option = "cli", goals: List[Goal] | None = None) -> Memory:
         """
         Execute the GAME loop for this agent with a maximum iteration limit.
+        The LLM calls are awaited, so one event loop can drive many agents at once.
+
+        :param goals: goals for this run only, on top of the agent's own (per-session or per-turn context).
+                      The agent is shared by every session, so run-time context is passed here, never added to self.goals.
         """
 
         # set up memory
@@ -144,18 +201,27 @@ class Agent:
         call_agent_tool = self.actions.get_action("call_agent")
         if call_agent_tool and registry:
             names = list(registry.agents.keys())
-            call_agent_tool.description = f"Call another agent to finish a task. List of available agents: {names}"
+            description = f"Call another agent to finish a task. List of available agents: {names}"
+            if call_agent_tool.description != description:
+                call_agent_tool.description = description
+                self.actions.version += 1
 
 
         for _ in range(max_iterations):
             # 1. Construct a prompt that includes the Goals, Actions, and the current Memory
-            prompt = self.construct_prompt(self.goals, memory, self.actions)
+            prompt = self.construct_prompt(self.goals, memory, self.actions, goals)
             if debug:
                 self.debugging(ui_option, f">({self.name}) Agent thinking...\n")
                 
 
-            # 2. Generate a response from the agent
-            response = self.prompt_llm_for_action(prompt)
+            # 2. Generate a response from the agent (its text is streamed while the tool call is still being written)
+            text_stream = TextStream().start() if self.streams_text and ui_option == "streamlit" else None
+            try:
+                response = await self.aprompt_llm_for_action(prompt, text_stream.put if text_stream else None,
+                                                             text_stream.reset if text_stream else None)
+            finally:
+                if text_stream:
+                    text_stream.close()
             self.update_memory(memory, response, "assistant")
             self.update_memory_global(response, role = "assistant")
             if debug:
@@ -183,6 +249,9 @@ class Agent:
                     if debug:
                         self.debugging(ui_option, f">({self.name}) Action Result: {result}\n")
 
+            if self.remember_response and result.get("tool_executed"):
+                self.remember_response(prompt, response)
+
             # 5. Update the agent's memory with information about what happened
             self.update_memory(memory, result, "user")
             self.update_memory_global(result, "user")
@@ -1,11 +1,12 @@
 """Implements the GAME structure of an AI Agent"""
 
+from collections import deque
 from dataclasses import dataclass
 import json
 import inspect
 import time 
 import traceback
-from typing import List, Callable, Dict, Any, Tuple, get_type_hints, Optional
+from typing import List, Callable, Deque, Dict, Any, Tuple, get_type_hints, Optional
 
 
 # * Goal class
@@ -19,6 +20,12 @@ class Prompt:
     messages: List[Dict]
     tools: List[Dict]
 
+# * Static head of every prompt of an agent (goals as system messages, tool schemas); shared, never mutated
+@dataclass(frozen=True)
+class PromptPrefix:
+    messages: Tuple[Dict, ...]
+    tools: Tuple[Dict, ...]
+
 # * Action class
 class Action:
     def __init__(self,
@@ -44,6 +51,7 @@ class ActionRegistry:
     def __init__(self):
         self.actions = {}
         self.actions_by_tag = {}
+        self.version = 0    # bumped whenever an action is registered or changed, so cached tool schemas are rebuilt
 
     def _get_json_type(self, python_type) -> str:
        """將 Python 型別映射至 JSON Schema 型別"""
@@ -91,6 +99,7 @@ class ActionRegistry:
 
     def register(self, action: Action):
         self.actions[action.name] = action
+        self.version += 1
 
     def get_action(self, name: str) -> Action | None:
         return self.actions.get(name, None)
@@ -169,18 +178,61 @@ class ActionContext:
             return self._llm
         return self._properties.get(key, default)
     
+def estimate_tokens(item: dict) -> int:
+    """Rough token count of a message (about 4 characters per token, plus the per-message overhead)"""
+    return len(json.dumps(item, default=str, ensure_ascii=False)) // 4 + 4
+
+
 class Memory:
-    def __init__(self, max_history=20):
-        self.items = []
+    """
+    Agent memory: a ring buffer of message units, with a token-budgeted context window.
+
+    A unit is a message together with the tool result that answers it, so a window never starts on an orphan result.
+    Token counts are estimated once, when an item is added. The oldest units are dropped when the buffer is full,
+    and only the newest units that fit in 'max_history' tokens are sent to the LLM; the newest unit and the current
+    task (the latest item added with task=True, i.e. the current canva) always are, since older game turns are stale.
+
+    :param max_history: token budget of the context window
+    :param max_units: units kept in storage
+    """
+    def __init__(self, max_history=2000, max_units=256):
         self.max_history = max_history
+        self.units: Deque[Tuple[List[Dict], int]] = deque(maxlen=max_units)
+        self._task: Tuple[List[Dict], int] | None = None
 
-    def add_memory(self, item: dict):
-        self.items.append(item)
+    @property
+    def items(self) -> List[Dict]:
+        return [item for unit, _ in self.units for item in unit]
+
+    def add_memory(self, item: dict, task: bool = False):
+        """
+        :param task: 'item' is a new task (e.g. the current canva): it starts its own unit, even after an assistant
+                     message whose result never came (an aborted turn), and it becomes the current task
+        """
+        tokens = estimate_tokens(item)
+        # a result (role 'user' or 'tool') right after an assistant message belongs to it
+        if self.units and not task and item.get("role") in ("user", "tool"):
+            unit, unit_tokens = self.units[-1]
+            if unit[-1].get("role") == "assistant":
+                unit.append(item)
+                self.units[-1] = (unit, unit_tokens + tokens)
+                return
+        self.units.append(([item], tokens))
+        if task:
+            self._task = self.units[-1]
 
     def get_memories(self, limit: int| None = None) -> List[Dict]:
-        # 只取最近的 N 則紀錄，避免 Token 爆炸
+        # 只取最近、總 Token 數在預算內的紀錄，避免 Token 爆炸
         limit = limit or self.max_history
-        return self.items[-limit:]
+        window, total = [], 0
+        for entry in reversed(self.units):
+            if window and total + entry[1] > limit:
+                if self._task is not None and all(unit is not self._task for unit in window):
+                    window.append(self._task)
+                break
+            window.append(entry)
+            total += entry[1]
+        return [item for unit, _ in reversed(window) for item in unit]
     
 class Environment:
     def execute_action(self, action: Action, action_context: ActionContext, args: dict) -> dict:
@@ -210,6 +262,13 @@ class Environment:
 2. parse response
 """
 class AgentFunctionCallingActionLanguage:
+    def __init__(self, cache_control: bool = False):
+        """
+        :param cache_control: mark the end of the static prompt prefix with a 'cache_control' breakpoint, for providers
+                              with explicit prompt caching (OpenAI-compatible providers cache identical prefixes anyway)
+        """
+        self.cache_control = cache_control
+
     def format_goals(self, goals: List[Goal]):
         # 建議將目標合併成一個 system message 或是置頂
         descriptions = [g.content for g in goals]
@@ -230,13 +289,40 @@ class AgentFunctionCallingActionLanguage:
             } for action in actions
         ]
 
+    def format_result(self, result: dict) -> str:
+        """Minimal tool-result payload for the LLM: the tool's return value or the error, without traceback or timestamp"""
+        if result.get("tool_executed"):
+            value = result.get("result")
+            if isinstance(value, str):
+                return value
+            try:
+                return json.dumps(value)
+            except (TypeError, ValueError):     # a tool may return anything; its text still tells the LLM the outcome
+                return str(value)
+        if result.get("error"):
+            return f"Error: {result['error']}"
+        return result.get("message", "")
+
+    def format_prefix(self, actions: List[Action], goals: List[Goal]) -> PromptPrefix:
+        """The part of the prompt that only changes with the goals and the tools"""
+        messages = self.format_goals(goals)
+        if self.cache_control and messages:
+            last = messages[-1]
+            messages[-1] = {**last, "content": [{"type": "text", "text": last["content"],
+                                                 "cache_control": {"type": "ephemeral"}}]}
+        return PromptPrefix(messages=tuple(messages), tools=tuple(self.format_actions(actions)))
+
+    def assemble_prompt(self, prefix: PromptPrefix, memory: Memory, overlay: List[Goal] | None = None) -> Prompt:
+        """
+        Per-turn prompt: the static prefix, the goals of this run only (e.g. the session's difficulty), the memory window.
+        The overlay comes after the prefix, so the prefix stays identical for provider-side prompt caching.
+        """
+        overlay_msgs = self.format_goals(overlay) if overlay else []
+        return Prompt(messages=[*prefix.messages, *overlay_msgs, *self.format_memory(memory)], tools=list(prefix.tools))
+
     def construct_prompt(self, actions: List[Action], environment: Any, 
                          goals: List[Goal], memory: Memory) -> Prompt:
-        prompt_msgs = []
-        prompt_msgs += self.format_goals(goals)
-        prompt_msgs += self.format_memory(memory)
-        tools = self.format_actions(actions)
-        return Prompt(messages=prompt_msgs, tools=tools)
+        return self.assemble_prompt(self.format_prefix(actions, goals), memory)
 
     def parse_response(self, response: Any) -> dict:
         # 假設 response 是 Message 物件
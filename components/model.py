@@ -1,25 +1,343 @@
-from litellm import completion
-from typing import List, Dict
+import litellm
+from litellm import acompletion, Message
+from litellm.exceptions import (APIConnectionError, BadGatewayError, InternalServerError, RateLimitError,
+                                ServiceUnavailableError, Timeout)
+from typing import Any, Awaitable, Callable, List, Dict, Optional, Tuple
+from components.cache import ResponseCache, prompt_key
 from components.game import Prompt
+from config import (RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_PATH, LLM_MODEL, LLM_API_BASE,
+                    LLM_TIMEOUT_S, LLM_RETRIES, LLM_RETRY_BACKOFF_S, LLM_HEDGE, LLM_MAX_CONNECTIONS)
+from collections import deque
+import asyncio
+import httpx
+import json
 import os
+import random
+import threading
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
 load_dotenv()
 
-os.environ["CEREBRAS_API_KEY"] = st.secrets["CEREBRAS_API_KEY"]
+# the default provider's key, from .streamlit/secrets.toml (or the environment); a custom LLM_API_BASE uses LLM_API_KEY
+if not LLM_API_BASE and "CEREBRAS_API_KEY" not in os.environ:
+    os.environ["CEREBRAS_API_KEY"] = st.secrets["CEREBRAS_API_KEY"]
 
+MODEL = LLM_MODEL
 
-def generate_response(prompt: Prompt):
+# shared by every session of the server process, so repeated positions skip the network round-trip.
+# An answer is only added by remember_response, once the agent has played its move: a rejected move is asked again.
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_S, RESPONSE_CACHE_PATH)
+
+
+def _dump_message(message) -> str:
+    """Serialize the parts of a Message the agent reads (content and tool calls)"""
+    tool_calls = [
+        {"type": "function", "function": {"name": call.function.name, "arguments": call.function.arguments}}
+        for call in (message.tool_calls or [])
+    ]
+    return json.dumps({"content": message.content, "tool_calls": tool_calls or None})
+
+
+def _load_message(data: str) -> Message:
+    """Rebuild a cached Message; tool calls get fresh ids, like a new completion would"""
+    body = json.loads(data)
+    for call in body["tool_calls"] or []:
+        call["id"] = f"call_{uuid.uuid4().hex[:24]}"
+    return Message(role="assistant", content=body["content"], tool_calls=body["tool_calls"])
+
+
+class LLMUnavailable(RuntimeError):
+    """The LLM gave no answer before the deadline, or kept failing with transient errors"""
+
+
+class IncompleteToolCall(RuntimeError):
+    """A streamed answer ended before the arguments of its tool call were complete"""
+
+
+# rate limits, 5xx, network errors and cut streams are worth another try; bad requests and auth errors are not
+RETRYABLE_ERRORS = (Timeout, APIConnectionError, RateLimitError, ServiceUnavailableError, InternalServerError,
+                    BadGatewayError, httpx.TransportError, IncompleteToolCall)
+
+
+class LLMClient:
     """
-    Call LLM and return message that contents both tool usage and chat content
+    Long-lived LLM client shared by every session. All requests run on one event loop in a daemon thread, so the pooled
+    HTTP session (kept-alive connections to the provider) is reused across calls, reruns and sessions.
+
+    Every call has a deadline. Transient errors are retried with jittered exponential backoff while time is left, and a
+    hedged request (an identical second request, sent once the first is slower than the recent p95 latency) cuts the
+    tail: the first answer wins and the other request is cancelled. LLMUnavailable is raised when the deadline expires.
+
+    :param timeout_s: deadline of one call, retries and hedging included
+    :param retries: retries after the first attempt
+    :param backoff_s: base of the backoff; attempt n waits a random time in [0, backoff_s * 2**n]
+    :param hedge: send hedged requests (only once 'min_samples' latencies are known)
+    :param max_connections: size of the HTTP connection pool
     """
-    response = completion(
-        model="cerebras/gpt-oss-120b",
+    def __init__(self, timeout_s: float = 30.0, retries: int = 2, backoff_s: float = 0.5, hedge: bool = True,
+                 max_connections: int = 20, min_samples: int = 20, window: int = 200) -> None:
+        self.timeout_s = timeout_s
+        self.retries = retries
+        self.backoff_s = backoff_s
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self.session = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(timeout_s),
+        )
+        self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._loop.run_forever, name="llm-client", daemon=True).start()
+        self.calls = 0
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.timeouts = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """Delay before a hedged request: the p95 of recent latencies (None while there are too few of them)"""
+        if not self.hedge or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def _attempt(self, request: Callable[[float], Awaitable[Any]], deadline: float, hedge: bool) -> Any:
+        """One attempt: 'request', plus a hedged copy if it is slower than the p95. The first success wins."""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        tasks = {asyncio.ensure_future(request(deadline - started))}
+        delay = self.hedge_delay() if hedge else None
+        hedge_task, errors = None, []
+        try:
+            if delay is not None and started + delay < deadline:
+                done, _ = await asyncio.wait(tasks, timeout=delay)
+                if not done:
+                    self.hedged += 1
+                    hedge_task = asyncio.ensure_future(request(deadline - loop.time()))
+                    tasks.add(hedge_task)
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, timeout=deadline - loop.time(),
+                                                 return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    raise asyncio.TimeoutError
+                for task in done:
+                    if task.exception() is None:
+                        self._latencies.append(loop.time() - started)
+                        self.hedge_wins += task is hedge_task
+                        return task.result()
+                    errors.append(task.exception())
+            raise errors[0]
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _call(self, request: Callable[[float], Awaitable[Any]], hedge: bool) -> Any:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout_s
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._attempt(request, deadline, hedge)
+            except asyncio.TimeoutError:
+                break
+            except RETRYABLE_ERRORS as e:
+                backoff = random.uniform(0, self.backoff_s * 2 ** attempt)
+                if attempt == self.retries or loop.time() + backoff >= deadline:
+                    raise LLMUnavailable(f"The LLM failed: {e}") from e
+                self.retried += 1
+                await asyncio.sleep(backoff)
+        self.timeouts += 1
+        raise LLMUnavailable(f"The LLM did not answer within {self.timeout_s:g} s.")
+
+    async def run(self, request: Callable[[float], Awaitable[Any]], hedge: bool = True) -> Any:
+        """
+        Await 'request' on the client's event loop, from any thread or event loop.
+
+        :param request: coroutine function of the time left (seconds); called again for retries and hedges
+        :param hedge: allow a hedged copy (not for requests with side effects, e.g. streamed text)
+        """
+        self.calls += 1
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._call(request, hedge), self._loop))
+
+    def run_sync(self, request: Callable[[float], Awaitable[Any]], hedge: bool = True) -> Any:
+        """Blocking 'run'"""
+        self.calls += 1
+        return asyncio.run_coroutine_threadsafe(self._call(request, hedge), self._loop).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Calls, retries, hedged requests (and how many the hedge won), timeouts and the current hedge delay"""
+        return {"calls": self.calls, "retried": self.retried, "hedged": self.hedged, "hedge_wins": self.hedge_wins,
+                "timeouts": self.timeouts, "hedge_delay": self.hedge_delay()}
+
+
+llm_client = LLMClient(LLM_TIMEOUT_S, LLM_RETRIES, LLM_RETRY_BACKOFF_S, LLM_HEDGE, LLM_MAX_CONNECTIONS)
+# litellm sends async requests through this session, so its connections are pooled and kept alive
+litellm.aclient_session = llm_client.session
+
+
+def _completion_kwargs(prompt: Prompt, timeout: float) -> Dict:
+    kwargs = dict(
+        model=MODEL,
         messages=prompt.messages,
         max_tokens=60000,
-        tools=prompt.tools if prompt.tools else None # 確保沒有工具時傳 None
+        tools=prompt.tools if prompt.tools else None, # 確保沒有工具時傳 None
+        timeout=timeout,
+        max_retries=0,  # the client retries
     )
-    
+    if LLM_API_BASE:
+        kwargs.update(api_base=LLM_API_BASE, api_key=os.environ.get("LLM_API_KEY", "none"))
+    return kwargs
+
+
+async def _complete(prompt: Prompt, timeout: float):
+    response = await acompletion(**_completion_kwargs(prompt, timeout))
+    return response.choices[0].message
+
+
+def generate_response(prompt: Prompt):
+    """
+    Call LLM and return message that contents both tool usage and chat content.
+    Identical prompts (same goals, memory window and canva) are answered from the response cache (see remember_response).
+    """
+    cached = response_cache.get(prompt_key(MODEL, prompt))
+    if cached is not None:
+        return _load_message(cached)
+
     # 直接回傳 Message 物件，這是 LiteLLM 內部的標準格式
     # 它包含了 .content 和 .tool_calls
-    return response.choices[0].message
\ No newline at end of file
+    message = llm_client.run_sync(lambda timeout: _complete(prompt, timeout))
+    return message
+
+
+async def agenerate_response(prompt: Prompt):
+    """Awaitable generate_response: the event loop keeps serving other agents while the LLM answers"""
+    cached = response_cache.get(prompt_key(MODEL, prompt))
+    if cached is not None:
+        return _load_message(cached)
+
+    return await llm_client.run(lambda timeout: _complete(prompt, timeout))
+
+
+def _complete_arguments(call: Dict) -> bool:
+    """A streamed tool call is complete once its arguments parse as a JSON object"""
+    try:
+        return isinstance(json.loads(call["function"]["arguments"]), dict)
+    except json.JSONDecodeError:
+        return False
+
+
+async def _stream(prompt: Prompt, timeout: float, on_text: Optional[Callable[[str], None]]) -> Tuple[str, Dict]:
+    """One streamed request: its text and its tool calls by index (IncompleteToolCall if the first one is cut)"""
+    stream = await acompletion(**_completion_kwargs(prompt, timeout), stream=True)
+    content, calls = [], {}
+    try:
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            text = getattr(delta, "reasoning_content", None) or ""
+            if delta.content:
+                content.append(delta.content)
+                text += delta.content
+            if text and on_text:
+                on_text(text)
+
+            # tool calls arrive in pieces: the first delta has the id and name, the next ones extend the arguments
+            for call in delta.tool_calls or []:
+                entry = calls.setdefault(call.index or 0, {"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+                entry["id"] = call.id or entry["id"]
+                entry["function"]["name"] += call.function.name or ""
+                entry["function"]["arguments"] += call.function.arguments or ""
+            if calls and _complete_arguments(calls[min(calls)]):
+                break
+    finally:
+        await stream.aclose()
+    if calls and not _complete_arguments(calls[min(calls)]):
+        raise IncompleteToolCall(f"The stream ended inside a call to '{calls[min(calls)]['function']['name']}'")
+    return "".join(content), calls
+
+
+class _StreamSink:
+    """
+    Shows the text of one of several attempts of a streamed call (retries, hedged copies) through 'on_text'.
+
+    The first attempt to produce text is shown; the others keep theirs. If the shown attempt fails, 'on_reset' clears
+    its partial text and the next attempt to produce text is shown from its start. If another attempt wins, its text
+    replaces the shown one, so the user never sees a failed or losing attempt's text next to the answer.
+    """
+    def __init__(self, on_text: Callable[[str], None], on_reset: Optional[Callable[[], None]]) -> None:
+        self.on_text = on_text
+        self.on_reset = on_reset
+        self._shown: Optional[List[str]] = None     # chunks of the attempt being shown
+        self._done = False
+
+    def writer(self) -> Tuple[Callable[[str], None], List[str]]:
+        """A text callback for a new attempt, and the list its chunks are kept in"""
+        chunks: List[str] = []
+
+        def write(text: str) -> None:
+            chunks.append(text)
+            if self._shown is None and not self._done:
+                self._shown = chunks
+                self.on_text("".join(chunks))
+            elif self._shown is chunks:
+                self.on_text(text)
+        return write, chunks
+
+    def _show(self, chunks: Optional[List[str]]) -> None:
+        if self._shown and self.on_reset:
+            self.on_reset()
+        self._shown = chunks
+        if chunks:
+            self.on_text("".join(chunks))
+
+    def finish(self, chunks: List[str]) -> None:
+        """The attempt won: make sure its text is the one shown"""
+        if self._done:
+            return
+        if self._shown is not chunks:
+            self._show(chunks)
+        self._done = True
+
+    def drop(self, chunks: List[str]) -> None:
+        """The attempt failed or was cancelled: hide its text, unless the call is already answered"""
+        if self._shown is chunks and not self._done:
+            self._show(None)
+
+
+async def astream_response(prompt: Prompt, on_text: Optional[Callable[[str], None]] = None,
+                           on_reset: Optional[Callable[[], None]] = None):
+    """
+    Streaming agenerate_response. Text (and reasoning) deltas go to 'on_text' as they arrive, and the stream is cut as
+    soon as the first tool call has complete arguments, so the move is made at time-to-first-tool-call.
+    Retries and hedged copies are streamed too; 'on_reset' clears the text of an attempt that failed (see _StreamSink).
+    A stream that ends inside its first tool call failed, and is retried like a transient error.
+    """
+    cached = response_cache.get(prompt_key(MODEL, prompt))
+    if cached is not None:
+        return _load_message(cached)
+
+    sink = _StreamSink(on_text, on_reset) if on_text else None
+
+    async def attempt(timeout: float) -> Tuple[str, Dict]:
+        write, chunks = sink.writer() if sink else (None, None)
+        try:
+            result = await _stream(prompt, timeout, write)
+        except BaseException:
+            if sink:
+                sink.drop(chunks)
+            raise
+        if sink:
+            sink.finish(chunks)
+        return result
+
+    content, calls = await llm_client.run(attempt)
+    tool_calls = [calls[i] for i in sorted(calls) if _complete_arguments(calls[i])]
+    for call in tool_calls:
+        call["id"] = call["id"] or f"call_{uuid.uuid4().hex[:24]}"
+    return Message(role="assistant", content=content, tool_calls=tool_calls or None)
+
+
+def remember_response(prompt: Prompt, message) -> None:
+    """Cache the answer to 'prompt' once its action was executed without error (e.g. the move was legal)"""
+    response_cache.put(prompt_key(MODEL, prompt), _dump_message(message))
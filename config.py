@@ -2,12 +2,95 @@
 # * Configuration
 
 """
-Set the context window
+Set the context window: token budget of the agent memory sent with each LLM call (about two game turns;
+the current canva is always sent, older turns only while they fit)
 """
-MAX_HISTORY = 3              
+MAX_HISTORY = 300
 
 """
 Debug mode. If True, the cli and strealmit would print agents' thoughts and communication.
 When developing with streamlit, you could make debug mode controllable in main_st.py and disable this global contant.
 """
-DEBUG = True                 # Either True or False
\ No newline at end of file
+DEBUG = True                 # Either True or False
+
+"""
+Path of the solved-position table written by 'python -m engine.solver'. The AI falls back to search or the LLM when it is missing.
+"""
+SOLVED_TABLE_PATH = "solved.bin"
+
+"""
+Native search backend: search depth (plies) for each difficulty, and the time budget per AI move in milliseconds.
+"""
+SEARCH_DEPTH = {"easy": 1, "medium": 3, "hard": 10}
+SEARCH_TIME_BUDGET_MS = 40
+
+"""
+Entries in each search transposition table (fixed memory per AI session; see TranspositionTable.stats() for hit rates).
+"""
+SEARCH_TT_ENTRIES = 1 << 16
+
+"""
+Draw rule shared by the UI, the AI agent loop, the search and the simulator:
+the game is drawn when the same position (including whose turn it is) occurs REPETITION_LIMIT times,
+or after MAX_GAME_MOVES moves in total. Set either to 0 to disable it.
+"""
+REPETITION_LIMIT = 3
+MAX_GAME_MOVES = 200
+
+"""
+LLM response cache: entries kept in memory (least recently used evicted first), their lifetime in seconds (0: no expiry),
+and an optional SQLite file that keeps them across restarts (None: memory only, e.g. "response_cache.sqlite").
+"""
+RESPONSE_CACHE_SIZE = 1024
+RESPONSE_CACHE_TTL_S = 24 * 3600
+RESPONSE_CACHE_PATH = None
+
+"""
+Stream the LLM's answer: its text is shown as it arrives, and the move is made as soon as the tool call is complete.
+"""
+LLM_STREAMING = True
+
+"""
+LLM client: model, and an OpenAI-compatible endpoint to send it to instead of the provider's (None: the provider's;
+e.g. LLM_MODEL = "openai/stub" with LLM_API_BASE = "http://127.0.0.1:8765/v1" for a local stub server; its key is read
+from the LLM_API_KEY environment variable, and no CEREBRAS_API_KEY secret is needed).
+"""
+LLM_MODEL = "cerebras/gpt-oss-120b"
+LLM_API_BASE = None
+
+"""
+LLM client: deadline of one LLM call in seconds (the native engine plays the move when it expires), retries on
+transient errors and the base of their jittered backoff, hedged requests after the p95 latency, and HTTP pool size.
+LLM_HEDGE applies to streamed (LLM_STREAMING) and plain calls alike; a hedge is only sent once 20 latencies are known.
+"""
+LLM_TIMEOUT_S = 30
+LLM_RETRIES = 2
+LLM_RETRY_BACKOFF_S = 0.5
+LLM_HEDGE = True
+LLM_MAX_CONNECTIONS = 20
+
+"""
+Mark the static prompt prefix (goals and tools) with a 'cache_control' breakpoint, for providers with explicit prompt
+caching (e.g. Anthropic models). OpenAI-compatible providers, Cerebras included, cache identical prefixes without it.
+"""
+PROMPT_CACHE_CONTROL = False
+
+"""
+Rows per page of the Memory tab (the agents' transcript).
+"""
+MEMORY_PAGE_SIZE = 50
+
+"""
+Agents' transcript (Memory tab): rows kept in memory per session; older rows are spilled to an append-only JSONL file
+in TRANSCRIPT_DIR (None: the system temporary directory), removed when the session ends.
+"""
+TRANSCRIPT_TAIL_ROWS = 500
+TRANSCRIPT_DIR = None
+
+"""
+Call gc.freeze() after the startup imports and after each lazily loaded module, so Streamlit's full collection after
+every script or fragment run skips those long-lived objects. It is process-wide: the frozen objects are never
+collected, and other code in the process sees gc.get_freeze_count() grow. Off by default; see "Garbage collection"
+in the README for what it saves.
+"""
+GC_FREEZE = False
@@ -0,0 +1,7 @@
+# The modules are imported from the repository root (e.g. 'from engine.state import State'), as in app.py.
+import os
+
+# components.model reads the Cerebras key from .streamlit/secrets.toml unless it is set; the tests never call Cerebras
+os.environ.setdefault("CEREBRAS_API_KEY", "test")
+# litellm would otherwise download its model cost map when it is imported
+os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True")
@@ -0,0 +1,184 @@
+"""
+Vectorized engine that advances K games at once with numpy.
+
+Every game is stored in the same layout as engine.state.State (occupancy masks, packed FIFOs, mark counts), one
+array element per game, so a step applies K moves, expires old marks and checks all 10 lines for every game in a
+handful of array operations. Finished games are frozen and ignore later moves.
+
+Usage (random self-play benchmark against the one-game engine):
+
+    python -m engine.batch --games 10000
+"""
+
+import argparse
+import random
+import time
+from typing import List
+
+import numpy as np
+
+from engine.board import SIZE, MAX_MARKS, LINE_MASKS
+from engine.core import GameEngine, DrawRule, DEFAULT_DRAW_RULE
+from engine.index import popcount_table, nth_free_table
+from engine.state import State
+
+
+CELLS = SIZE * SIZE
+_LINES = np.array(LINE_MASKS, dtype=np.int64)
+_BITS = np.int64(1) << np.arange(CELLS, dtype=np.int64)
+
+# same bit layout as State.key
+_N1_SHIFT, _Q2_SHIFT, _N2_SHIFT, _TURN_SHIFT = 16, 19, 35, 38
+
+
+class BatchEngine:
+    """
+    K independent games played in lockstep.
+
+    :param games: number of games K
+    :param draw_rule: draw rule applied to every game (repetitions and move cap)
+    """
+    def __init__(self, games: int, draw_rule: DrawRule = DEFAULT_DRAW_RULE) -> None:
+        self.size = games
+        self.draw_rule = draw_rule
+        self.masks = np.zeros((games, 2), dtype=np.int64)      # occupancy mask of player 1 / 2
+        self.queues = np.zeros((games, 2), dtype=np.int64)     # packed FIFO, oldest mark in the lowest nibble
+        self.counts = np.zeros((games, 2), dtype=np.int64)     # marks of player 1 / 2
+        self.turn = np.ones(games, dtype=np.int8)              # player to move
+        self.winner = np.zeros(games, dtype=np.int8)           # 0 while nobody has won
+        self.draw = np.zeros(games, dtype=bool)
+        self.moves_played = 0                                  # steps taken by the batch
+        self.lengths = np.zeros(games, dtype=np.int64)         # moves played in each game
+        # packed keys after every step (one row per step, grown by doubling when there is no move cap)
+        self._history = np.empty((draw_rule.max_moves + 1 if draw_rule.max_moves > 0 else 64, games), dtype=np.int64)
+        self._history[0] = self.keys()
+
+    @property
+    def active(self) -> np.ndarray:
+        return (self.winner == 0) & ~self.draw
+
+    def keys(self) -> np.ndarray:
+        """Packed State keys of every game"""
+        return (self.queues[:, 0] | self.counts[:, 0] << _N1_SHIFT | self.queues[:, 1] << _Q2_SHIFT
+                | self.counts[:, 1] << _N2_SHIFT | (self.turn.astype(np.int64) - 1) << _TURN_SHIFT)
+
+    def states(self) -> List[State]:
+        return [State.from_key(int(key)) for key in self.keys()]
+
+    def legal_mask(self) -> np.ndarray:
+        """(K, 16) bool array of empty cells (all False for finished games)"""
+        occupied = self.masks[:, 0] | self.masks[:, 1]
+        return ((occupied[:, None] & _BITS) == 0) & self.active[:, None]
+
+    def random_moves(self, rng: np.random.Generator) -> np.ndarray:
+        """A uniformly random legal move per game (meaningless for finished games)"""
+        occupied = self.masks[:, 0] | self.masks[:, 1]
+        free = CELLS - popcount_table()[occupied]
+        n = (rng.random(self.size) * free).astype(np.int64)
+        return nth_free_table()[occupied, n]
+
+    def step(self, moves: np.ndarray) -> None:
+        """Apply one move per game (entries of finished games are ignored)"""
+        moves = np.asarray(moves, dtype=np.int64)
+        active = self.active
+        rows = np.flatnonzero(active)
+        if not len(rows):
+            return
+
+        cells = moves[rows]
+        player = self.turn[rows].astype(np.int64) - 1
+        occupied = self.masks[rows, 0] | self.masks[rows, 1]
+        if np.any((occupied >> cells) & 1) or np.any((cells < 0) | (cells >= CELLS)):
+            raise ValueError("Every move must be an empty cell.")
+
+        mask = self.masks[rows, player]
+        queue = self.queues[rows, player]
+        count = self.counts[rows, player]
+
+        # expire the oldest mark of players who already have MAX_MARKS, then append the new mark
+        full = count == MAX_MARKS
+        oldest = queue & 0xF
+        mask = np.where(full, mask & ~(np.int64(1) << oldest), mask) | (np.int64(1) << cells)
+        queue = np.where(full, queue >> 4 | cells << (4 * (MAX_MARKS - 1)), queue | cells << (4 * count))
+        count = np.where(full, count, count + 1)
+
+        self.masks[rows, player] = mask
+        self.queues[rows, player] = queue
+        self.counts[rows, player] = count
+
+        # all 10 lines of every game at once
+        won = ((mask[:, None] & _LINES) == _LINES).any(axis=1)
+        self.winner[rows[won]] = player[won] + 1
+        self.turn[rows] = 2 - player
+
+        # draw rule: occurrences of the new position in each game's history, and the move cap
+        self.moves_played += 1
+        self.lengths[rows] += 1
+        t = self.moves_played
+        if t == len(self._history):
+            self._history = np.concatenate([self._history, np.empty_like(self._history)])
+        keys = self.keys()
+        self._history[t] = keys
+
+        rows = rows[~won]
+        if self.draw_rule.repetitions > 0:
+            # the turn is part of the key, so only every other earlier position can match
+            keys = keys[rows]
+            occurrences = (self._history[t % 2:t + 1:2, rows] == keys).sum(axis=0)
+            self.draw[rows[occurrences >= self.draw_rule.repetitions]] = True
+        if self.draw_rule.max_moves > 0 and t >= self.draw_rule.max_moves:
+            self.draw[rows] = True
+
+    def boards(self) -> np.ndarray:
+        """(K, 4, 4) boards in the canva format (-1 / -2 mark the cell each player loses on their next move)"""
+        boards = np.zeros((self.size, CELLS), dtype=np.int8)
+        for p in (0, 1):
+            queue, count = self.queues[:, p], self.counts[:, p]
+            for i in range(MAX_MARKS):
+                rows = np.flatnonzero(count > i)
+                boards[rows, queue[rows] >> (4 * i) & 0xF] = p + 1
+            rows = np.flatnonzero((count == MAX_MARKS) & self.active)
+            boards[rows, queue[rows] & 0xF] = -(p + 1)
+        return boards.reshape(self.size, SIZE, SIZE)
+
+
+def play_random(games: int, seed: int = 0, draw_rule: DrawRule = DEFAULT_DRAW_RULE) -> BatchEngine:
+    """Play 'games' random games to the end in one batch"""
+    rng = np.random.default_rng(seed)
+    batch = BatchEngine(games, draw_rule)
+    while batch.active.any():
+        batch.step(batch.random_moves(rng))
+    return batch
+
+
+def play_random_loop(games: int, seed: int = 0, draw_rule: DrawRule = DEFAULT_DRAW_RULE) -> int:
+    """The same workload, one GameEngine at a time. Returns the number of moves played"""
+    rng = random.Random(seed)
+    moves = 0
+    for _ in range(games):
+        game = GameEngine(draw_rule=draw_rule)
+        while not game.is_over:
+            game.apply_move(rng.choice(game.legal_moves()))
+        moves += game.moves_played
+    return moves
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the batch engine with the one-game engine on random self-play.")
+    parser.add_argument("--games", type=int, default=10000, help="games per batch (K)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    batch = play_random(args.games, args.seed)
+    batch_seconds = time.perf_counter() - t0
+    batch_moves = int(batch.lengths.sum())
+
+    t0 = time.perf_counter()
+    loop_moves = play_random_loop(args.games, args.seed)
+    loop_seconds = time.perf_counter() - t0
+
+    print(f"batch: {args.games:,} games, {batch_moves:,} moves in {batch_seconds:.2f} s ({batch_moves / batch_seconds:,.0f} moves/sec)")
+    print(f"       player 1 wins {np.mean(batch.winner == 1):.1%}, player 2 wins {np.mean(batch.winner == 2):.1%}, draws {np.mean(batch.draw):.1%}")
+    print(f"loop : {args.games:,} games, {loop_moves:,} moves in {loop_seconds:.2f} s ({loop_moves / loop_seconds:,.0f} moves/sec)")
+    print(f"speedup: {loop_seconds / batch_seconds:.1f}x")
@@ -0,0 +1,48 @@
+"""Board geometry shared by the engine modules"""
+
+from typing import Tuple
+
+
+SIZE = 4                     # the board is SIZE x SIZE
+MAX_MARKS = 4                # each player keeps at most MAX_MARKS marks on the board
+EMPTY = 0
+
+# compact board encoding (one character per cell): empty, player 1, player 2; lowercase marks expire next move
+COMPACT_SYMBOLS = {0: ".", 1: "X", 2: "O", -1: "x", -2: "o"}
+
+# all winning lines (rows, columns and the two diagonals) as tuples of cell indices
+LINES = (
+    tuple(tuple(r * SIZE + c for c in range(SIZE)) for r in range(SIZE))
+    + tuple(tuple(r * SIZE + c for r in range(SIZE)) for c in range(SIZE))
+    + (tuple(i * SIZE + i for i in range(SIZE)),
+       tuple(i * SIZE + (SIZE - 1 - i) for i in range(SIZE)))
+)
+
+# the same lines as 16-bit occupancy masks (bit i is cell i)
+LINE_MASKS = tuple(sum(1 << cell for cell in line) for line in LINES)
+
+# for each cell, the masks of the winning lines that go through it (2 or 3 lines per cell)
+LINE_MASKS_THROUGH = tuple(
+    tuple(line_mask for line_mask in LINE_MASKS if line_mask >> cell & 1) for cell in range(SIZE * SIZE)
+)
+
+
+def to_cell(row: int, col: int) -> int:
+    """Convert (row, col) coordinates to a cell index"""
+    return row * SIZE + col
+
+
+def to_coords(cell: int) -> Tuple[int, int]:
+    """Convert a cell index to (row, col) coordinates"""
+    return divmod(cell, SIZE)
+
+
+def completes_line(mask: int, cell: int) -> bool:
+    """
+    Check whether the occupancy mask of the player who just marked 'cell' contains a winning line.
+    Only the lines through 'cell' can have been completed by that move.
+    """
+    for line_mask in LINE_MASKS_THROUGH[cell]:
+        if mask & line_mask == line_mask:
+            return True
+    return False
@@ -0,0 +1,109 @@
+"""Headless rules engine for the 4x4 disappearing-mark Tic-Tac-Toe (no Streamlit dependency)"""
+
+from dataclasses import dataclass
+from typing import List, Dict, Optional
+
+from config import REPETITION_LIMIT, MAX_GAME_MOVES
+from engine.board import SIZE, completes_line, to_coords
+from engine.state import State
+
+
+@dataclass(frozen=True)
+class DrawRule:
+    """
+    When a game without a winner ends in a draw.
+
+    :param repetitions: the same position occurs this many times (0 disables the rule)
+    :param max_moves: this many moves have been played (0 disables the cap)
+    """
+    repetitions: int = REPETITION_LIMIT
+    max_moves: int = MAX_GAME_MOVES
+
+    def is_draw(self, occurrences: int, moves_played: int) -> bool:
+        return ((self.repetitions > 0 and occurrences >= self.repetitions)
+                or (self.max_moves > 0 and moves_played >= self.max_moves))
+
+
+DEFAULT_DRAW_RULE = DrawRule()
+
+
+class GameEngine:
+    """
+    Pure game state for one 4x4 disappearing-mark game.
+
+    - Player 1 always moves first.
+    - After a player places a fifth mark, their oldest mark is removed.
+    - A player wins with four of their (at most four) marks in a row, column or diagonal.
+    - Otherwise the game is drawn by the draw rule (repeated position or move cap).
+    """
+    def __init__(self, state: Optional[State] = None, draw_rule: DrawRule = DEFAULT_DRAW_RULE) -> None:
+        self.state = state or State()
+        self.draw_rule = draw_rule
+        self.winner: Optional[int] = None
+        self.draw = False
+        self.moves_played = 0
+        self.repetitions: Dict[int, int] = {self.state.key: 1}     # packed state key -> occurrences
+
+    def copy(self) -> "GameEngine":
+        other = GameEngine(self.state, self.draw_rule)
+        other.winner = self.winner
+        other.draw = self.draw
+        other.moves_played = self.moves_played
+        other.repetitions = dict(self.repetitions)
+        return other
+
+    @property
+    def is_over(self) -> bool:
+        return bool(self.winner) or self.draw
+
+    @property
+    def current_player(self) -> int:
+        # the winner keeps the turn once the game is over, as in the UI
+        return self.winner or self.state.turn
+
+    @property
+    def player_move(self) -> Dict[int, List[int]]:
+        """Cells of each player, oldest first"""
+        return self.state.player_move()
+
+    def legal_moves(self) -> List[int]:
+        """Return the empty cells the current player may mark (empty if the game is over)"""
+        if self.is_over:
+            return []
+        return self.state.legal_moves()
+
+    def apply_move(self, cell: int) -> Optional[int]:
+        """
+        Mark a cell for the current player and return the winner (or None).
+
+        :param cell: cell index (row * 4 + col)
+        """
+        if self.is_over:
+            raise ValueError("The game is already over.")
+        if not 0 <= cell < SIZE * SIZE or self.state.occupied >> cell & 1:
+            raise ValueError(f"Cell {to_coords(cell)} is not available.")
+
+        # place the mark (the state drops the oldest one if the player has more than four)
+        player = self.state.turn
+        state = self.state.play(cell)
+
+        self.state = state
+        self.moves_played += 1
+        if completes_line(state.mask(player), cell):
+            self.winner = player
+        else:
+            occurrences = self.repetitions.get(state.key, 0) + 1
+            self.repetitions[state.key] = occurrences
+            self.draw = self.draw_rule.is_draw(occurrences, self.moves_played)
+        return self.winner
+
+    def to_board(self) -> List[List[int]]:
+        """
+        Return the board as nested lists, in the canva format used by the UI and the LLM agent:
+        0 is empty, 1 / 2 are player marks, and -1 / -2 mark the cell that is removed on that player's next move.
+        """
+        return self.state.to_canva(mark_expiring=not self.is_over)
+
+    def to_compact(self) -> str:
+        """Return the board in the compact format sent to the LLM agent (see State.to_compact)"""
+        return self.state.to_compact(mark_expiring=not self.is_over)
@@ -0,0 +1,76 @@
+"""Compact game history: a one-byte-per-move log with periodic keyframes, boards rebuilt on demand"""
+
+from typing import List, Tuple
+
+from engine.board import MAX_MARKS, to_coords
+from engine.state import State
+
+
+KEYFRAME_INTERVAL = 32       # moves between two stored states; seeking replays at most this many moves
+_CELL = 0x0F                 # low nibble of a logged move: the marked cell
+_EXPIRED = 0x10              # set when the move removed the player's oldest mark
+
+
+class MoveLog:
+    """
+    History of one game as a move log instead of a board per move.
+
+    Each move is one byte (cell, plus a flag when it removed the player's oldest mark), and the packed key of the state
+    is kept every KEYFRAME_INTERVAL moves. A board is rebuilt from the nearest keyframe before it, so seeking costs at
+    most KEYFRAME_INTERVAL moves. Players alternate, so the player of a move follows from its index.
+
+    :param state: position before the first move
+    """
+    def __init__(self, state: State | None = None) -> None:
+        state = state or State()
+        self._moves = bytearray()
+        self._keyframes: List[int] = [state.key]
+        self._tip = state
+        self._first = state.turn     # player of move 0
+        self.over = False            # the last board is final (no expiring marks shown)
+
+    def __len__(self) -> int:
+        return len(self._moves)
+
+    def record(self, cell: int, over: bool = False) -> None:
+        """Log the move of the player to move; 'over' tells whether it ended the game"""
+        count = self._tip.n1 if self._tip.turn == 1 else self._tip.n2
+        self._moves.append(cell | (_EXPIRED if count == MAX_MARKS else 0))
+        self._tip = self._tip.play(cell)
+        if len(self._moves) % KEYFRAME_INTERVAL == 0:
+            self._keyframes.append(self._tip.key)
+        self.over = over
+
+    def truncate(self, length: int) -> None:
+        """Keep the first 'length' moves (undo the later ones); the game is no longer over"""
+        if not 0 <= length <= len(self._moves):
+            raise ValueError(f"Cannot truncate a log of {len(self._moves)} moves to {length}")
+        self._tip = self.state(length - 1)
+        del self._moves[length:]
+        del self._keyframes[length // KEYFRAME_INTERVAL + 1:]
+        self.over = False
+
+    def move(self, i: int) -> Tuple[int, Tuple[int, int]]:
+        """(player, (row, col)) of move i (0-based)"""
+        player = self._first if i % 2 == 0 else 3 - self._first
+        return player, to_coords(self._moves[i] & _CELL)
+
+    def moves(self) -> List[Tuple[int, Tuple[int, int]]]:
+        return [self.move(i) for i in range(len(self._moves))]
+
+    def expired(self, i: int) -> bool:
+        """Whether move i removed the player's oldest mark"""
+        return bool(self._moves[i] & _EXPIRED)
+
+    def state(self, i: int) -> State:
+        """State after move i, replayed from the nearest keyframe"""
+        frame = (i + 1) // KEYFRAME_INTERVAL
+        state = State.from_key(self._keyframes[frame])
+        for byte in self._moves[frame * KEYFRAME_INTERVAL:i + 1]:
+            state = state.play(byte & _CELL)
+        return state
+
+    def board(self, i: int) -> List[List[int]]:
+        """Canva after move i, as the UI showed it (the expiring marks are shown unless the game ended there)"""
+        final = self.over and i == len(self._moves) - 1
+        return self.state(i).to_canva(mark_expiring=not final)
@@ -0,0 +1,148 @@
+"""
+Perfect index of the disappearing-mark state space.
+
+A position is seen from the player to move: the mover's marks M and the opponent's marks O, both oldest first.
+Positions are grouped in segments by (len(M), len(O)), and inside a segment the sequence M + O of distinct cells
+is ranked in the falling-factorial number system, so every position has exactly one index in [0, TOTAL_STATES).
+Once both players have four marks the position does not depend on who started, so (4, 4) is shared by both sides.
+"""
+
+from functools import lru_cache
+from math import perm
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from engine.board import SIZE
+from engine.state import State
+
+
+CELLS = SIZE * SIZE
+
+# (mover marks, opponent marks) in the order they occur in a game; the mover after (a, b) is in (b, min(a + 1, 4))
+SEGMENTS = ((0, 0), (0, 1), (1, 1), (1, 2), (2, 2), (2, 3), (3, 3), (3, 4), (4, 4))
+
+SEGMENT_SIZE = {seg: perm(CELLS, sum(seg)) for seg in SEGMENTS}
+SEGMENT_OFFSET = {}
+_offset = 0
+for _seg in SEGMENTS:
+    SEGMENT_OFFSET[_seg] = _offset
+    _offset += SEGMENT_SIZE[_seg]
+TOTAL_STATES = _offset
+
+
+@lru_cache(maxsize=None)
+def digit_weights(length: int) -> Tuple[int, ...]:
+    """Weight of each position when ranking a sequence of 'length' distinct cells"""
+    return tuple(perm(CELLS - 1 - i, length - 1 - i) for i in range(length))
+
+
+# * -------------------------------------------------------------------------------
+# * Scalar ranking (one state at a time)
+
+def rank(cells: List[int]) -> int:
+    """Rank a sequence of distinct cells among all sequences of the same length"""
+    index, used = 0, 0
+    for cell, weight in zip(cells, digit_weights(len(cells))):
+        index += (cell - bin(used & ((1 << cell) - 1)).count("1")) * weight
+        used |= 1 << cell
+    return index
+
+
+def unrank(index: int, length: int) -> List[int]:
+    cells, used = [], 0
+    for weight in digit_weights(length):
+        digit, index = divmod(index, weight)
+        cell = [c for c in range(CELLS) if not used >> c & 1][digit]
+        cells.append(cell)
+        used |= 1 << cell
+    return cells
+
+
+def state_index(state: State) -> Optional[int]:
+    """Return the index of a state, or None if its mark counts cannot occur in a game"""
+    mover, opponent = state.moves(state.turn), state.moves(3 - state.turn)
+    seg = (len(mover), len(opponent))
+    if seg not in SEGMENT_OFFSET:
+        return None
+    return SEGMENT_OFFSET[seg] + rank(mover + opponent)
+
+
+def index_state(index: int, turn: Optional[int] = None) -> State:
+    """
+    Rebuild the state at an index.
+
+    :param turn: player to move. Only needed for the (4, 4) segment, which is shared by both players (default 1).
+    """
+    a, b = segment_of(index)
+    cells = unrank(index - SEGMENT_OFFSET[(a, b)], a + b)
+    if a != b:
+        turn = 2
+    elif a < 4 or turn is None:
+        turn = 1
+    moves = {turn: cells[:a], 3 - turn: cells[a:]}
+    return State.from_canva([[0] * SIZE] * SIZE,
+                            player_move={p: [divmod(c, SIZE) for c in moves[p]] for p in (1, 2)},
+                            turn=turn)
+
+
+# * -------------------------------------------------------------------------------
+# * Vectorized ranking (numpy, many states at a time)
+
+# the lookup tables below are built on first use, so scalar lookups do not pay for them
+
+@lru_cache(maxsize=None)
+def popcount_table() -> np.ndarray:
+    """popcount_table()[mask] is the number of cells in 'mask'"""
+    masks = np.arange(1 << CELLS, dtype=np.uint32)
+    return sum(masks >> i & 1 for i in range(CELLS)).astype(np.uint8)
+
+
+@lru_cache(maxsize=None)
+def nth_free_table() -> np.ndarray:
+    """nth_free_table()[used, n] is the n-th cell not in the 'used' mask"""
+    masks = np.arange(1 << CELLS, dtype=np.uint32)
+    free = (masks[:, None] >> np.arange(CELLS, dtype=np.uint32) & 1) == 0
+    position = np.cumsum(free, axis=1) - 1
+    table = np.zeros((1 << CELLS, CELLS), dtype=np.uint8)
+    rows, cols = np.nonzero(free)
+    table[rows, position[rows, cols]] = cols
+    return table
+
+
+def rank_array(cells: np.ndarray, length: Optional[int] = None) -> np.ndarray:
+    """
+    Rank each row of 'cells' (shape (N, k)) as the first k cells of a sequence of 'length' cells.
+    With length > k the result is the partial rank of the prefix; the remaining digits add to it.
+    """
+    n, k = cells.shape
+    length = length or k
+    popcount = popcount_table()
+    index = np.zeros(n, dtype=np.int64)
+    used = np.zeros(n, dtype=np.uint32)
+    for i, weight in enumerate(digit_weights(length)[:k]):
+        cell = cells[:, i].astype(np.uint32)
+        digit = cell - popcount[used & ((np.uint32(1) << cell) - np.uint32(1))]
+        index += digit.astype(np.int64) * weight
+        used |= np.uint32(1) << cell
+    return index
+
+
+def unrank_array(index: np.ndarray, length: int) -> np.ndarray:
+    """Inverse of rank_array: return the (N, length) cells of each index"""
+    index = index.astype(np.int64)
+    nth_free = nth_free_table()
+    cells = np.zeros((len(index), length), dtype=np.uint8)
+    used = np.zeros(len(index), dtype=np.uint32)
+    for i, weight in enumerate(digit_weights(length)):
+        digit, index = np.divmod(index, weight)
+        cells[:, i] = nth_free[used, digit]
+        used |= np.uint32(1) << cells[:, i].astype(np.uint32)
+    return cells
+
+
+def segment_of(index: int) -> Tuple[int, int]:
+    for seg in reversed(SEGMENTS):
+        if index >= SEGMENT_OFFSET[seg]:
+            return seg
+    raise ValueError(f"Invalid index {index}")
@@ -0,0 +1,75 @@
+"""Move providers: interchangeable ways to pick a move for the player to move"""
+
+import random
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from engine.board import completes_line
+from engine.core import GameEngine
+from engine.search import Searcher
+from engine.table import SolvedTable
+
+
+class MoveProvider(ABC):
+    """Interface of a move provider. 'choose_move' returns a legal cell index for the player to move."""
+    name = "provider"
+
+    @abstractmethod
+    def choose_move(self, game: GameEngine) -> int:
+        ...
+
+
+class RandomProvider(MoveProvider):
+    name = "random"
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.rng = random.Random(seed)
+
+    def choose_move(self, game: GameEngine) -> int:
+        return self.rng.choice(game.legal_moves())
+
+
+class GreedyProvider(MoveProvider):
+    """One-ply rule of thumb: win if possible, otherwise block the opponent's win, otherwise play at random"""
+    name = "greedy"
+
+    def __init__(self, seed: Optional[int] = None) -> None:
+        self.rng = random.Random(seed)
+
+    def choose_move(self, game: GameEngine) -> int:
+        state = game.state
+        legal = game.legal_moves()
+        mover, opponent = state.kept_mask(state.turn), state.kept_mask(3 - state.turn)
+        for mask in (mover, opponent):
+            for cell in legal:
+                if completes_line(mask | 1 << cell, cell):
+                    return cell
+        return self.rng.choice(legal)
+
+
+class SearchProvider(MoveProvider):
+    """
+    Native alpha-beta search.
+
+    :param depth: deepest iteration in plies (the difficulty knob)
+    :param time_budget_ms: wall-clock budget per move
+    :param tt_entries: size of the transposition table
+    """
+    name = "search"
+
+    def __init__(self, depth: int, time_budget_ms: float = 40, tt_entries: int = 1 << 16) -> None:
+        self.searcher = Searcher(max_depth=depth, time_budget_ms=time_budget_ms, tt_entries=tt_entries)
+
+    def choose_move(self, game: GameEngine) -> int:
+        return self.searcher.search(game.state, game.repetitions, game.moves_played).move
+
+
+class TableProvider(MoveProvider):
+    """Perfect play from the solved table (the table values do not depend on the draw rule)"""
+    name = "table"
+
+    def __init__(self, table: SolvedTable) -> None:
+        self.table = table
+
+    def choose_move(self, game: GameEngine) -> int:
+        return self.table.best_move(game.state)
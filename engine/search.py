@@ -0,0 +1,199 @@
+"""Iterative-deepening negamax with alpha-beta pruning, move ordering and a transposition table"""
+
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from engine.board import SIZE, LINE_MASKS, LINE_MASKS_THROUGH, completes_line
+from engine.core import DrawRule, DEFAULT_DRAW_RULE
+from engine.state import State
+from engine.tt import TranspositionTable, EXACT, LOWER, UPPER
+
+
+WIN_SCORE = 10000            # score of an immediate win; a win n plies away scores WIN_SCORE - n
+MATE_BOUND = WIN_SCORE - 1000
+
+# score of 0 / 1 / 2 / 3 marks alone on an open line
+LINE_WEIGHT = (0, 1, 4, 16)
+
+# cells on more lines are tried first when nothing better is known
+CELL_ORDER = sorted(range(SIZE * SIZE), key=lambda cell: -len(LINE_MASKS_THROUGH[cell]))
+
+_NODES_PER_CLOCK_CHECK = 128
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@dataclass
+class SearchResult:
+    move: Optional[int]
+    score: int
+    depth: int               # deepest fully searched depth
+    nodes: int
+    elapsed_ms: float
+
+
+def evaluate(state: State) -> int:
+    """
+    Static score for the player to move: lines held by one player only, weighted by their number of marks.
+    A player's oldest mark does not count once they have four, because it disappears on their next move.
+    """
+    mover, opponent = state.kept_mask(state.turn), state.kept_mask(3 - state.turn)
+    score = 0
+    for line_mask in LINE_MASKS:
+        m, o = (mover & line_mask).bit_count(), (opponent & line_mask).bit_count()
+        if not o:
+            score += LINE_WEIGHT[m]
+        elif not m:
+            score -= LINE_WEIGHT[o]
+    return score
+
+
+def order_moves(state: State, tt_move: Optional[int] = None) -> List[int]:
+    """Transposition-table move first, then wins, then blocks of the opponent's wins, then central cells"""
+    free = ~state.occupied
+    mover, opponent = state.kept_mask(state.turn), state.kept_mask(3 - state.turn)
+    wins, blocks, rest = [], [], []
+    for cell in CELL_ORDER:
+        if not free >> cell & 1 or cell == tt_move:
+            continue
+        if completes_line(mover | 1 << cell, cell):
+            wins.append(cell)
+        elif completes_line(opponent | 1 << cell, cell):
+            blocks.append(cell)
+        else:
+            rest.append(cell)
+    moves = wins + blocks + rest
+    if tt_move is not None and free >> tt_move & 1:
+        moves.insert(0, tt_move)
+    return moves
+
+
+class Searcher:
+    """
+    Search a position for the player to move.
+
+    :param max_depth: deepest iteration, in plies
+    :param time_budget_ms: wall-clock budget per move; the best move of the last completed iteration is returned
+    :param table: transposition table, kept between searches (a new one with 'tt_entries' entries by default)
+    :param draw_rule: positions that the rule declares drawn score 0
+    """
+    def __init__(self, max_depth: int = 8, time_budget_ms: float = 40,
+                 table: Optional[TranspositionTable] = None, tt_entries: int = 1 << 16,
+                 draw_rule: DrawRule = DEFAULT_DRAW_RULE) -> None:
+        self.max_depth = max_depth
+        self.time_budget_ms = time_budget_ms
+        self.table = table or TranspositionTable(tt_entries)
+        self.draw_rule = draw_rule
+        self.nodes = 0
+        self._deadline = 0.0
+        self._root_move: Optional[int] = None
+        self._seen: Dict[int, int] = {}           # occurrences of each position in the game and on the search path
+        self._moves_played = 0
+
+    def negamax(self, state: State, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.nodes += 1
+        if self.nodes % _NODES_PER_CLOCK_CHECK == 0 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+        # the draw rule applies inside the search too: repeating a position is worth a draw
+        key = state.key
+        occurrences = self._seen.get(key, 0) + 1
+        if ply > 0 and self.draw_rule.is_draw(occurrences, self._moves_played + ply):
+            return 0
+
+        entry = self.table.probe(state)
+        tt_move = None
+        if entry is not None:
+            entry_depth, bound, score, tt_move = entry
+            if entry_depth >= depth and ply > 0:
+                score = _from_table(score, ply)
+                if bound == EXACT:
+                    return score
+                if bound == LOWER and score >= beta:
+                    return score
+                if bound == UPPER and score <= alpha:
+                    return score
+
+        if depth == 0:
+            return evaluate(state)
+
+        original_alpha = alpha
+        player = state.turn
+        best_score, best_move = -WIN_SCORE - 1, None
+        self._seen[key] = occurrences
+        for cell in order_moves(state, tt_move):
+            child = state.play(cell)
+            if completes_line(child.mask(player), cell):
+                score = WIN_SCORE - ply - 1
+            else:
+                score = -self.negamax(child, depth - 1, -beta, -alpha, ply + 1)
+
+            if score > best_score:
+                best_score, best_move = score, cell
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                break
+        self._seen[key] = occurrences - 1
+
+        if best_score <= original_alpha:
+            bound = UPPER
+        elif best_score >= beta:
+            bound = LOWER
+        else:
+            bound = EXACT
+        self.table.store(state, depth, bound, _to_table(best_score, ply), best_move)
+        if ply == 0:
+            self._root_move = best_move
+        return best_score
+
+    def search(self, state: State, repetitions: Optional[Dict[int, int]] = None, moves_played: int = 0) -> SearchResult:
+        """
+        Search with increasing depth until max_depth or the time budget runs out.
+
+        :param repetitions: occurrences of each position so far in the game (GameEngine.repetitions)
+        :param moves_played: moves played so far in the game
+        """
+        started = time.perf_counter()
+        self._deadline = started + self.time_budget_ms / 1000
+        self.nodes = 0
+
+        legal = state.legal_moves()
+        best = SearchResult(move=legal[0] if legal else None, score=0, depth=0, nodes=0, elapsed_ms=0.0)
+        self._moves_played = moves_played
+        for depth in range(1, self.max_depth + 1):
+            # the game's own positions; the root is counted again when the search enters it
+            self._seen = dict(repetitions or {})
+            if self._seen.get(state.key):
+                self._seen[state.key] -= 1
+            try:
+                score = self.negamax(state, depth, -WIN_SCORE - 1, WIN_SCORE + 1, 0)
+            except SearchTimeout:
+                break
+            best.move, best.score, best.depth = self._root_move, score, depth
+            # a forced result is known, deeper iterations cannot change it
+            if abs(score) >= MATE_BOUND:
+                break
+
+        best.nodes = self.nodes
+        best.elapsed_ms = (time.perf_counter() - started) * 1000
+        return best
+
+
+def _to_table(score: int, ply: int) -> int:
+    """Store win/loss scores relative to the stored position rather than the root"""
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
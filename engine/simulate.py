@@ -0,0 +1,158 @@
+"""
+Self-play simulator: plays many games between two move providers on the headless engine and reports throughput.
+
+Usage:
+
+    python -m engine.simulate --p1 random --p2 search --games 1000 --workers 4
+"""
+
+import argparse
+import os
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from config import SEARCH_TIME_BUDGET_MS, SOLVED_TABLE_PATH
+from engine.core import GameEngine
+from engine.providers import MoveProvider, RandomProvider, GreedyProvider, SearchProvider, TableProvider
+from engine.table import open_table
+
+
+POLICIES = ("random", "greedy", "search", "table")
+
+# upper bounds (microseconds) of the per-move latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_US = (10, 100, 1_000, 10_000, 100_000)
+
+
+def make_provider(policy: str, seed: Optional[int] = None, depth: int = 3,
+                  time_budget_ms: float = SEARCH_TIME_BUDGET_MS, table_path: str = SOLVED_TABLE_PATH) -> MoveProvider:
+    if policy == "random":
+        return RandomProvider(seed)
+    if policy == "greedy":
+        return GreedyProvider(seed)
+    if policy == "search":
+        return SearchProvider(depth, time_budget_ms)
+    if policy == "table":
+        table = open_table(table_path)
+        if table is None:
+            raise FileNotFoundError(f"No solved table at {table_path}. Run 'python -m engine.solver' first.")
+        return TableProvider(table)
+    raise ValueError(f"Unknown policy '{policy}'. Choose from {POLICIES}.")
+
+
+@dataclass
+class PolicyStats:
+    moves: int = 0
+    seconds: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS_US) + 1))
+
+    def add(self, other: "PolicyStats") -> None:
+        self.moves += other.moves
+        self.seconds += other.seconds
+        self.histogram = [a + b for a, b in zip(self.histogram, other.histogram)]
+
+
+@dataclass
+class SimulationStats:
+    games: int = 0
+    moves: int = 0
+    wins: Dict[int, int] = field(default_factory=lambda: {1: 0, 2: 0})
+    draws: int = 0
+    policies: Dict[int, PolicyStats] = field(default_factory=lambda: {1: PolicyStats(), 2: PolicyStats()})
+
+    def add(self, other: "SimulationStats") -> None:
+        self.games += other.games
+        self.moves += other.moves
+        self.draws += other.draws
+        for player in (1, 2):
+            self.wins[player] += other.wins[player]
+            self.policies[player].add(other.policies[player])
+
+
+def play_games(p1: str, p2: str, games: int, seed: int = 0, depth: int = 3,
+               time_budget_ms: float = SEARCH_TIME_BUDGET_MS, table_path: str = SOLVED_TABLE_PATH) -> SimulationStats:
+    """Play 'games' games in this process; player 1 uses policy 'p1' and player 2 uses 'p2'"""
+    providers = {
+        1: make_provider(p1, seed, depth, time_budget_ms, table_path),
+        2: make_provider(p2, seed + 1, depth, time_budget_ms, table_path),
+    }
+    stats = SimulationStats()
+    clock = time.perf_counter
+    for _ in range(games):
+        game = GameEngine()
+        while not game.is_over:
+            player = game.current_player
+            t0 = clock()
+            cell = providers[player].choose_move(game)
+            elapsed = clock() - t0
+            game.apply_move(cell)
+
+            policy = stats.policies[player]
+            policy.moves += 1
+            policy.seconds += elapsed
+            policy.histogram[bisect_right(LATENCY_BUCKETS_US, elapsed * 1e6)] += 1
+
+        stats.games += 1
+        stats.moves += game.moves_played
+        if game.winner:
+            stats.wins[game.winner] += 1
+        else:
+            stats.draws += 1
+    return stats
+
+
+def simulate(p1: str, p2: str, games: int, workers: int = 1, seed: int = 0, **kwargs) -> SimulationStats:
+    """Split the games over 'workers' processes (in-process when workers == 1) and merge their statistics"""
+    if workers <= 1:
+        return play_games(p1, p2, games, seed, **kwargs)
+
+    shares = [games // workers + (i < games % workers) for i in range(workers)]
+    total = SimulationStats()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(play_games, p1, p2, n, seed + 1000 * i, **kwargs)
+                   for i, n in enumerate(shares) if n]
+        for future in futures:
+            total.add(future.result())
+    return total
+
+
+def format_report(stats: SimulationStats, names: Dict[int, str], elapsed: float) -> str:
+    lines = [
+        f"{stats.games:,} games, {stats.moves:,} moves in {elapsed:.2f} s",
+        f"  games/sec      {stats.games / elapsed:,.1f}",
+        f"  moves/sec      {stats.moves / elapsed:,.0f}",
+        f"  avg length     {stats.moves / max(stats.games, 1):.1f} moves",
+        f"  player 1 wins  {stats.wins[1] / max(stats.games, 1):.1%} ({names[1]})",
+        f"  player 2 wins  {stats.wins[2] / max(stats.games, 1):.1%} ({names[2]})",
+        f"  draws          {stats.draws / max(stats.games, 1):.1%}",
+    ]
+    labels = [f"<{b:,}us" for b in LATENCY_BUCKETS_US] + [f">={LATENCY_BUCKETS_US[-1]:,}us"]
+    for player in (1, 2):
+        policy = stats.policies[player]
+        mean_us = policy.seconds / max(policy.moves, 1) * 1e6
+        lines.append(f"player {player} ({names[player]}): {policy.moves:,} moves, mean {mean_us:,.1f} us/move")
+        for label, count in zip(labels, policy.histogram):
+            share = count / max(policy.moves, 1)
+            lines.append(f"  {label:>12} {count:>10,} {'#' * round(share * 40)}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the game engine with self-play.")
+    parser.add_argument("--p1", choices=POLICIES, default="random", help="policy of player 1")
+    parser.add_argument("--p2", choices=POLICIES, default="random", help="policy of player 2")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1, help="processes (0: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=3, help="depth of the 'search' policy")
+    parser.add_argument("--budget-ms", type=float, default=SEARCH_TIME_BUDGET_MS, help="time budget of the 'search' policy")
+    parser.add_argument("--table", default=SOLVED_TABLE_PATH, help="solved table of the 'table' policy")
+    args = parser.parse_args()
+
+    workers = args.workers or os.cpu_count()
+    started = time.perf_counter()
+    stats = simulate(args.p1, args.p2, args.games, workers, args.seed,
+                     depth=args.depth, time_budget_ms=args.budget_ms, table_path=args.table)
+    print(format_report(stats, {1: args.p1, 2: args.p2}, time.perf_counter() - started))
@@ -0,0 +1,234 @@
+"""
+Offline retrograde solver for the 4x4 disappearing-mark Tic-Tac-Toe.
+
+Every position of engine.index is labelled with its game-theoretic value, one byte per position
+(the file format is described in engine.table):
+
+    0            draw (neither side can force a win)
+    odd  n       the player to move wins in n plies
+    even n       the player to move loses in n plies
+
+The solver works backwards from the end of the game, one ply count at a time. Pass 1 labels every position with an
+immediate winning move. An odd pass n labels the positions with a move to a position already lost in n - 1 plies,
+and an even pass n labels the positions whose moves all lead to positions won by the opponent. The solver stops at
+the first pass that labels nothing; the positions that are still unlabelled are draws.
+
+Usage:
+
+    python -m engine.solver --output solved.bin --workers 8
+
+    # keep one position per symmetry class (about 8x smaller, see engine.table)
+    python -m engine.solver --compact solved.bin --output solved-compact.bin
+"""
+
+import argparse
+import os
+import resource
+import time
+from multiprocessing import Pool
+from typing import Callable, Iterator, Tuple
+
+import numpy as np
+
+from engine.board import LINE_MASKS
+from engine.index import (CELLS, SEGMENTS, SEGMENT_OFFSET, SEGMENT_SIZE, TOTAL_STATES,
+                          popcount_table, rank_array, unrank_array)
+from engine.symmetry import TRANSFORMS, canonical_rank_array
+from engine.table import MAGIC, VERSION, COMPACT_VERSION, HEADER, HEADER_SIZE
+
+
+# masks that contain a complete line
+IS_LINE = np.zeros(1 << CELLS, dtype=bool)
+for _line_mask in LINE_MASKS:
+    IS_LINE[np.arange(1 << CELLS) & _line_mask == _line_mask] = True
+
+_BIT = np.uint32(1) << np.arange(CELLS, dtype=np.uint32)
+_BELOW = _BIT - np.uint32(1)
+
+
+# * -------------------------------------------------------------------------------
+# * Worker
+
+_values = None
+
+
+def _init_worker(path: str) -> None:
+    global _values
+    _values = np.memmap(path, dtype=np.uint8, mode="r+", offset=HEADER_SIZE, shape=(TOTAL_STATES,))
+
+
+def _mask(cells: np.ndarray) -> np.ndarray:
+    mask = np.zeros(len(cells), dtype=np.uint32)
+    for i in range(cells.shape[1]):
+        mask |= _BIT[cells[:, i]]
+    return mask
+
+
+def _solve_chunk(task: Tuple[Tuple[int, int], int, int, int]) -> Tuple[int, int, float]:
+    """
+    Label the positions of one chunk that resolve at 'ply'.
+    Returns (positions examined, positions labelled, peak memory of this worker in MB).
+    """
+    seg, start, stop, ply = task
+    a, b = seg
+    offset = SEGMENT_OFFSET[seg]
+    values = _values
+
+    # only unlabelled positions can change
+    pending = start + np.flatnonzero(values[offset + start:offset + stop] == 0)
+    if not len(pending):
+        return 0, 0, _peak_memory_mb()
+
+    # mover's marks, then opponent's marks, oldest first
+    cells = unrank_array(pending, a + b)
+    mover, opponent = cells[:, :a], cells[:, a:]
+    used = _mask(cells)
+
+    # marks the mover keeps after the move (the oldest goes once they have four)
+    kept = mover[:, 1:] if a == 4 else mover
+    kept_mask = _mask(kept)
+
+    if ply == 1:
+        hit = np.zeros(len(pending), dtype=bool)
+        if kept.shape[1] == 3:
+            for cell in range(CELLS):
+                legal = (used & _BIT[cell]) == 0
+                hit |= legal & IS_LINE[kept_mask | _BIT[cell]]
+    else:
+        # the successor is seen from the opponent: their marks first, then the mover's kept marks and the new cell.
+        # Everything but the new cell is the same for all moves, so rank that prefix once.
+        target = (b, min(a + 1, 4))
+        prefix_mask = _mask(opponent) | kept_mask
+        popcount = popcount_table()
+        base = SEGMENT_OFFSET[target] + rank_array(np.concatenate([opponent, kept], axis=1), sum(target))
+
+        hit = np.ones(len(pending), dtype=bool) if ply % 2 == 0 else np.zeros(len(pending), dtype=bool)
+        for cell in range(CELLS):
+            legal = (used & _BIT[cell]) == 0
+            successor = base + (cell - popcount[prefix_mask & _BELOW[cell]].astype(np.int64))
+            value = values[np.where(legal, successor, 0)]
+            if ply % 2 == 0:
+                # lost: every move leads to a position the opponent wins
+                hit &= ~legal | (value & 1 == 1)
+            else:
+                # won: some move leads to a position the opponent loses in ply - 1
+                hit |= legal & (value == ply - 1)
+
+    labelled = pending[hit]
+    values[offset + labelled] = ply
+    return len(pending), len(labelled), _peak_memory_mb()
+
+
+def _tasks(ply: int, chunk_size: int) -> Iterator[Tuple[Tuple[int, int], int, int, int]]:
+    for seg in SEGMENTS:
+        for start in range(0, SEGMENT_SIZE[seg], chunk_size):
+            yield seg, start, min(start + chunk_size, SEGMENT_SIZE[seg]), ply
+
+
+# * -------------------------------------------------------------------------------
+# * Driver
+
+def _peak_memory_mb() -> float:
+    """Peak resident memory of the calling process, in MB (mapped table pages included)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def solve(output: str, workers: int | None = None, chunk_size: int = 1 << 20,
+          log: Callable[[str], None] = print) -> int:
+    """
+    Solve every position and write the table to 'output'.
+    Returns the longest forced result in plies.
+    """
+    workers = workers or os.cpu_count()
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, 0, TOTAL_STATES).ljust(HEADER_SIZE, b"\0"))
+        f.truncate(HEADER_SIZE + TOTAL_STATES)
+
+    log(f"Solving {TOTAL_STATES:,} positions with {workers} workers")
+    started = time.perf_counter()
+    ply = 1
+    worker_mb = 0.0
+    with Pool(workers, initializer=_init_worker, initargs=(output,)) as pool:
+        while True:
+            if ply > 255:
+                raise RuntimeError("Results longer than 255 plies do not fit in one byte.")
+            t0 = time.perf_counter()
+            examined = labelled = 0
+            for n_examined, n_labelled, n_mb in pool.imap_unordered(_solve_chunk, _tasks(ply, chunk_size)):
+                examined += n_examined
+                labelled += n_labelled
+                worker_mb = max(worker_mb, n_mb)
+            elapsed = time.perf_counter() - t0
+            log(f"ply {ply:3d}: {labelled:>12,} labelled | {examined / elapsed:>12,.0f} states/sec "
+                f"| peak memory {_peak_memory_mb():,.0f} MB (main), {worker_mb:,.0f} MB (largest worker)")
+            if not labelled:
+                break
+            ply += 1
+
+    longest = ply - 1
+    with open(output, "r+b") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, longest, TOTAL_STATES))
+
+    values = np.memmap(output, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=(TOTAL_STATES,))
+    counts = np.bincount(values, minlength=256)
+    log(f"Done in {time.perf_counter() - started:,.0f} s: "
+        f"{counts[1::2].sum():,} wins, {counts[2::2].sum():,} losses, {counts[0]:,} draws, "
+        f"longest result {longest} plies")
+    return longest
+
+
+# a canonical sequence starts with the smallest cell of its first cell's orbit (the first digit decides the rank)
+_ORBIT_MIN = np.array([min(image[cell] for image in TRANSFORMS) for cell in range(CELLS)], dtype=np.uint8)
+
+
+def compact(source: str, output: str, chunk_size: int = 1 << 20, log: Callable[[str], None] = print) -> int:
+    """
+    Write the compact table of a solved table: the canonical positions only (see engine.table).
+    Returns the number of positions kept.
+    """
+    with open(source, "rb") as f:
+        magic, version, longest, count = HEADER.unpack(f.read(HEADER.size))
+    if magic != MAGIC or version != VERSION or count != TOTAL_STATES or longest == 0:
+        raise ValueError(f"{source} is not a complete solved table (version {VERSION}).")
+    values = np.memmap(source, dtype=np.uint8, mode="r", offset=HEADER_SIZE, shape=(TOTAL_STATES,))
+
+    started = time.perf_counter()
+    kept = 0
+    spill = output + ".values"
+    with open(output, "wb") as out, open(spill, "wb") as side:
+        out.write(b"\0" * HEADER_SIZE)
+        for seg in SEGMENTS:
+            offset, length = SEGMENT_OFFSET[seg], sum(seg)
+            for start in range(0, SEGMENT_SIZE[seg], chunk_size):
+                index = np.arange(start, min(start + chunk_size, SEGMENT_SIZE[seg]), dtype=np.int64)
+                if length:
+                    cells = unrank_array(index, length)
+                    candidate = cells[:, 0] == _ORBIT_MIN[cells[:, 0]]
+                    index, cells = index[candidate], cells[candidate]
+                    index = index[canonical_rank_array(cells) == index]
+                out.write((offset + index).astype(np.uint32).tobytes())
+                side.write(values[offset + index].tobytes())
+                kept += len(index)
+            log(f"segment {seg}: {kept:>12,} positions kept so far | {time.perf_counter() - started:,.0f} s")
+
+    with open(output, "r+b") as out, open(spill, "rb") as side:
+        out.write(HEADER.pack(MAGIC, COMPACT_VERSION, longest, kept))
+        out.seek(HEADER_SIZE + 4 * kept)
+        while block := side.read(1 << 24):
+            out.write(block)
+    os.remove(spill)
+    log(f"Kept {kept:,} of {TOTAL_STATES:,} positions ({HEADER_SIZE + 5 * kept:,} bytes)")
+    return kept
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the 4x4 disappearing-mark Tic-Tac-Toe by retrograde analysis.")
+    parser.add_argument("--output", default="solved.bin", help="path of the solved table")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=1 << 20, help="positions per task")
+    parser.add_argument("--compact", metavar="SOLVED", help="instead of solving, write the compact table of SOLVED")
+    args = parser.parse_args()
+    if args.compact:
+        compact(args.compact, args.output, args.chunk_size)
+    else:
+        solve(args.output, args.workers, args.chunk_size)
@@ -0,0 +1,60 @@
+"""Speculative replies: compute the AI's answer to every human move while the human is still choosing"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from engine.core import GameEngine
+from engine.providers import MoveProvider
+from engine.search import order_moves
+
+
+class Speculator:
+    """
+    Runs 'provider' in a background thread on every position the opponent can reach from the current one,
+    most likely opponent moves first (wins, blocks, central cells). Results are keyed on the packed key of the
+    position after the opponent's move; jobs for an earlier position are cancelled when a new one starts.
+
+    The provider is used by the background thread only, so it must not be shared with the foreground.
+
+    :param provider: move provider of the AI
+    """
+    def __init__(self, provider: MoveProvider) -> None:
+        self.provider = provider
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculate")
+        self._root: Optional[Tuple[int, int]] = None
+        self._jobs: Dict[int, Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def start(self, game: GameEngine) -> None:
+        """Queue a reply for each move of the player to move in 'game' (no-op if already queued for this position)"""
+        root = (game.state.key, game.moves_played)
+        if root == self._root or game.is_over:
+            return
+        self.cancel()
+        self._root = root
+        for cell in order_moves(game.state):
+            child = game.copy()
+            child.apply_move(cell)
+            if not child.is_over:
+                self._jobs[child.state.key] = self._executor.submit(self.provider.choose_move, child)
+
+    def take(self, game: GameEngine) -> Optional[int]:
+        """
+        Return the precomputed reply for 'game' (the position after the opponent's move), or None on a miss.
+        The other jobs are cancelled, so a reply that has not run yet is next in line.
+        """
+        future = self._jobs.pop(game.state.key, None)
+        self.cancel()
+        if future is None or future.cancelled():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return future.result()
+
+    def cancel(self) -> None:
+        """Drop every queued job (a running job finishes, but its result is discarded)"""
+        for future in self._jobs.values():
+            future.cancel()
+        self._jobs.clear()
+        self._root = None
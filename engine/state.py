@@ -0,0 +1,205 @@
+"""Compact, hashable game state: two 16-bit occupancy masks plus a packed FIFO of each player's marks"""
+
+from typing import List, Dict, Tuple, Optional, Sequence
+
+import numpy as np
+
+from engine.board import SIZE, MAX_MARKS, COMPACT_SYMBOLS, to_cell
+from engine import zobrist as Z
+
+
+"""
+Key layout (39 bits):
+
+    bits  0-15 : player 1 FIFO, 4 bits per cell, oldest mark in the lowest nibble
+    bits 16-18 : number of player 1 marks (0-4)
+    bits 19-34 : player 2 FIFO
+    bits 35-37 : number of player 2 marks
+    bit  38    : player to move (0 -> player 1, 1 -> player 2)
+"""
+_N1_SHIFT = 16
+_Q2_SHIFT = 19
+_N2_SHIFT = 35
+_TURN_SHIFT = 38
+
+
+class State:
+    """
+    Immutable snapshot of a 4x4 disappearing-mark position.
+
+    'play' returns a new State, so a State can be shared, cached and used as a dict key freely.
+    """
+    __slots__ = ("m1", "m2", "q1", "q2", "n1", "n2", "turn", "zobrist")
+
+    def __init__(self, m1: int = 0, m2: int = 0, q1: int = 0, q2: int = 0,
+                 n1: int = 0, n2: int = 0, turn: int = 1, zobrist: Optional[int] = None) -> None:
+        self.m1 = m1          # occupancy mask of player 1
+        self.m2 = m2          # occupancy mask of player 2
+        self.q1 = q1          # packed FIFO of player 1 cells
+        self.q2 = q2          # packed FIFO of player 2 cells
+        self.n1 = n1          # number of player 1 marks
+        self.n2 = n2          # number of player 2 marks
+        self.turn = turn      # player to move (1 or 2)
+        # 64-bit Zobrist hash (see engine.zobrist), updated incrementally by 'play'
+        self.zobrist = self._full_hash() if zobrist is None else zobrist
+
+    # * ---------------------------------------------------------------------------
+    # * Identity
+
+    @property
+    def key(self) -> int:
+        """Pack the whole state into one integer"""
+        return (self.q1 | self.n1 << _N1_SHIFT | self.q2 << _Q2_SHIFT
+                | self.n2 << _N2_SHIFT | (self.turn - 1) << _TURN_SHIFT)
+
+    @classmethod
+    def from_key(cls, key: int) -> "State":
+        q1, n1 = key & 0xFFFF, key >> _N1_SHIFT & 0b111
+        q2, n2 = key >> _Q2_SHIFT & 0xFFFF, key >> _N2_SHIFT & 0b111
+        return cls(_fifo_mask(q1, n1), _fifo_mask(q2, n2), q1, q2, n1, n2, (key >> _TURN_SHIFT & 1) + 1)
+
+    def _full_hash(self) -> int:
+        h = Z.hash_moves(1, self.moves(1)) ^ Z.hash_moves(2, self.moves(2))
+        return h ^ Z.TURN if self.turn == 2 else h
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, State) and self.key == other.key
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __repr__(self) -> str:
+        return f"State(turn={self.turn}, moves={self.player_move()})"
+
+    def copy(self) -> "State":
+        # states are never mutated in place
+        return self
+
+    # * ---------------------------------------------------------------------------
+    # * Rules
+
+    @property
+    def occupied(self) -> int:
+        return self.m1 | self.m2
+
+    def mask(self, player: int) -> int:
+        return self.m1 if player == 1 else self.m2
+
+    def kept_mask(self, player: int) -> int:
+        """Marks of a player that are still on the board after that player's next move"""
+        mask, q, n = (self.m1, self.q1, self.n1) if player == 1 else (self.m2, self.q2, self.n2)
+        if n == MAX_MARKS:
+            return mask & ~(1 << (q & 0xF))
+        return mask
+
+    def moves(self, player: int) -> List[int]:
+        """Cells marked by a player, oldest first"""
+        q, n = (self.q1, self.n1) if player == 1 else (self.q2, self.n2)
+        return [q >> (4 * i) & 0xF for i in range(n)]
+
+    def player_move(self) -> Dict[int, List[int]]:
+        return {1: self.moves(1), 2: self.moves(2)}
+
+    def legal_moves(self) -> List[int]:
+        free = ~self.occupied
+        return [cell for cell in range(SIZE * SIZE) if free >> cell & 1]
+
+    def play(self, cell: int) -> "State":
+        """
+        Return the state after the player to move marks 'cell'.
+        The caller is responsible for checking that the cell is empty.
+        """
+        if self.turn == 1:
+            m, q, n, h = _push(self.m1, self.q1, self.n1, cell, 1)
+            return State(m, self.m2, q, self.q2, n, self.n2, 2, self.zobrist ^ h ^ Z.TURN)
+        m, q, n, h = _push(self.m2, self.q2, self.n2, cell, 2)
+        return State(self.m1, m, self.q1, q, self.n1, n, 1, self.zobrist ^ h ^ Z.TURN)
+
+    # * ---------------------------------------------------------------------------
+    # * Conversion
+
+    def to_canva(self, mark_expiring: bool = True) -> List[List[int]]:
+        """
+        Return the board as nested lists in the canva format:
+        0 is empty, 1 / 2 are player marks, and -1 / -2 mark the cell that is removed on that player's next move.
+        """
+        cells = [0] * (SIZE * SIZE)
+        for player in (1, 2):
+            moves = self.moves(player)
+            for cell in moves:
+                cells[cell] = player
+            if mark_expiring and len(moves) == MAX_MARKS:
+                cells[moves[0]] = -player
+        return [cells[r * SIZE:(r + 1) * SIZE] for r in range(SIZE)]
+
+    def to_compact(self, mark_expiring: bool = True) -> str:
+        """
+        Return the board as 16 characters in 4 '/'-separated rows, e.g. 'X.O./..x./..../O..o':
+        '.' is empty, 'X' / 'O' are player 1 / 2 marks, lowercase marks the cell removed on that player's next move.
+        """
+        return "/".join("".join(COMPACT_SYMBOLS[value] for value in row) for row in self.to_canva(mark_expiring))
+
+    def to_board(self, mark_expiring: bool = True) -> np.ndarray:
+        """Return the board as the 4x4 numpy array kept in st.session_state['game_state']"""
+        return np.array(self.to_canva(mark_expiring))
+
+    @classmethod
+    def from_canva(cls, canva: Sequence[Sequence[int]],
+                   player_move: Optional[Dict[int, Sequence[Tuple[int, int]]]] = None,
+                   turn: Optional[int] = None) -> "State":
+        """
+        Build a state from a canva (nested lists or numpy array).
+
+        :param player_move: {player: [(row, col), ...]} oldest first. If omitted, the age order is inferred:
+                            the expiring (negative) mark is the oldest and the rest follow in row-major order.
+        :param turn: player to move. If omitted, player 1 moves when both players have the same number of marks.
+        """
+        if player_move is None:
+            player_move = {1: [], 2: []}
+            for player in (1, 2):
+                expiring = [(r, c) for r in range(SIZE) for c in range(SIZE) if canva[r][c] == -player]
+                marked = [(r, c) for r in range(SIZE) for c in range(SIZE) if canva[r][c] == player]
+                player_move[player] = expiring + marked
+
+        packed = {}
+        for player in (1, 2):
+            m, q, n = 0, 0, 0
+            for row, col in player_move[player]:
+                m, q, n, _ = _push(m, q, n, to_cell(int(row), int(col)), player)
+            packed[player] = (m, q, n)
+
+        (m1, q1, n1), (m2, q2, n2) = packed[1], packed[2]
+        if turn is None:
+            turn = 1 if n1 == n2 else 2
+        return cls(m1, m2, q1, q2, n1, n2, turn)
+
+    @classmethod
+    def from_board(cls, board: np.ndarray,
+                   player_move: Optional[Dict[int, Sequence[Tuple[int, int]]]] = None,
+                   turn: Optional[int] = None) -> "State":
+        """Build a state from the numpy board kept in st.session_state['game_state']"""
+        return cls.from_canva(np.asarray(board).tolist(), player_move, turn)
+
+
+def _push(mask: int, q: int, n: int, cell: int, player: int) -> Tuple[int, int, int, int]:
+    """
+    Append a cell to a player's FIFO, dropping the oldest mark beyond MAX_MARKS.
+    Returns the new (mask, fifo, count) and the Zobrist delta of the player's marks.
+    """
+    if n == 0:
+        return 1 << cell, cell, 1, Z.HEAD[player][cell]
+
+    newest = q >> 4 * (n - 1) & 0xF
+    h = Z.LINK[player][newest][cell]
+    if n == MAX_MARKS:
+        oldest, second = q & 0xF, q >> 4 & 0xF
+        h ^= Z.HEAD[player][oldest] ^ Z.LINK[player][oldest][second] ^ Z.HEAD[player][second]
+        return (mask & ~(1 << oldest)) | 1 << cell, q >> 4 | cell << 4 * (MAX_MARKS - 1), n, h
+    return mask | 1 << cell, q | cell << 4 * n, n + 1, h
+
+
+def _fifo_mask(q: int, n: int) -> int:
+    mask = 0
+    for i in range(n):
+        mask |= 1 << (q >> (4 * i) & 0xF)
+    return mask
@@ -0,0 +1,115 @@
+"""
+The eight symmetries of the 4x4 board (rotations and reflections).
+
+The 10 win lines map onto each other under every symmetry, so positions that differ by one have the same value and
+mirrored best moves. canonical_key maps a state, including the age order of the marks, to the smallest packed key
+among its eight images, and returns the transform used so moves can be mapped back with transform_cell.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+from engine.board import SIZE, MAX_MARKS, LINE_MASKS
+from engine.index import SEGMENT_OFFSET, rank, rank_array
+from engine.state import State
+
+
+CELLS = SIZE * SIZE
+_LAST = SIZE - 1
+
+
+def _cell_map(f) -> Tuple[int, ...]:
+    return tuple(f(cell // SIZE, cell % SIZE)[0] * SIZE + f(cell // SIZE, cell % SIZE)[1] for cell in range(CELLS))
+
+
+# TRANSFORMS[t][cell] is the image of 'cell' under transform t; transform 0 is the identity
+TRANSFORMS = (
+    _cell_map(lambda r, c: (r, c)),
+    _cell_map(lambda r, c: (c, _LAST - r)),              # rotate 90 degrees clockwise
+    _cell_map(lambda r, c: (_LAST - r, _LAST - c)),      # rotate 180 degrees
+    _cell_map(lambda r, c: (_LAST - c, r)),              # rotate 270 degrees
+    _cell_map(lambda r, c: (r, _LAST - c)),              # mirror left-right
+    _cell_map(lambda r, c: (_LAST - r, c)),              # mirror top-bottom
+    _cell_map(lambda r, c: (c, r)),                      # main diagonal
+    _cell_map(lambda r, c: (_LAST - c, _LAST - r)),      # anti-diagonal
+)
+
+# INVERSE[t] undoes transform t
+INVERSE = tuple(
+    next(u for u, other in enumerate(TRANSFORMS) if all(other[image] == cell for cell, image in enumerate(cells)))
+    for cells in TRANSFORMS
+)
+
+# numpy copy for mapping whole arrays of cells: TRANSFORM_ARRAY[t][cells]
+TRANSFORM_ARRAY = np.array(TRANSFORMS, dtype=np.uint8)
+
+assert all(sorted(sum(1 << cells[c] for c in range(CELLS) if mask >> c & 1) for mask in LINE_MASKS) == sorted(LINE_MASKS)
+           for cells in TRANSFORMS), "win lines must be symmetric"
+
+# a packed FIFO keeps one cell per nibble: map two nibbles per lookup
+_BYTE = tuple(tuple(cells[b & 0xF] | cells[b >> 4] << 4 for b in range(256)) for cells in TRANSFORMS)
+_QUEUE_MASK = tuple((1 << (4 * n)) - 1 for n in range(MAX_MARKS + 1))
+
+# State.key keeps player 1's FIFO in bits 0-15 and player 2's in bits 19-34; the other bits are counts and turn
+_Q2_SHIFT = 19
+_COUNTS_AND_TURN = ~(0xFFFF | 0xFFFF << _Q2_SHIFT)
+
+
+def transform_cell(cell: int, t: int) -> int:
+    return TRANSFORMS[t][cell]
+
+
+def image_key(state: State, t: int) -> int:
+    """Packed key of the image of 'state' under transform t (mark ages are kept)"""
+    byte = _BYTE[t]
+    q1, q2 = state.q1, state.q2
+    return (state.key & _COUNTS_AND_TURN | (byte[q1 & 0xFF] | byte[q1 >> 8] << 8) & _QUEUE_MASK[state.n1]
+            | ((byte[q2 & 0xFF] | byte[q2 >> 8] << 8) & _QUEUE_MASK[state.n2]) << _Q2_SHIFT)
+
+
+def transform_state(state: State, t: int) -> State:
+    return State.from_key(image_key(state, t))
+
+
+def canonical_key(state: State) -> Tuple[int, int]:
+    """
+    Return (key, t): the smallest packed key among the eight images of 'state', and the transform t that maps
+    'state' to it. A move 'cell' in 'state' is 'transform_cell(cell, t)' in the canonical position, and a canonical
+    move goes back with 'transform_cell(move, INVERSE[t])'.
+    """
+    # image_key inlined: this runs at every search node
+    q1, q2 = state.q1, state.q2
+    mask1, mask2 = _QUEUE_MASK[state.n1], _QUEUE_MASK[state.n2]
+    best_key = state.key
+    rest, best_t = best_key & _COUNTS_AND_TURN, 0
+    for t in range(1, len(TRANSFORMS)):
+        byte = _BYTE[t]
+        key = (rest | (byte[q1 & 0xFF] | byte[q1 >> 8] << 8) & mask1
+               | ((byte[q2 & 0xFF] | byte[q2 >> 8] << 8) & mask2) << _Q2_SHIFT)
+        if key < best_key:
+            best_key, best_t = key, t
+    return best_key, best_t
+
+
+def canonical(state: State) -> Tuple[State, int]:
+    """Return the canonical image of a state and the transform that maps 'state' to it"""
+    key, t = canonical_key(state)
+    return State.from_key(key), t
+
+
+# * -------------------------------------------------------------------------------
+# * Canonical table indices (engine.index order)
+
+def canonical_index(state: State) -> Optional[int]:
+    """Smallest engine.index index among the eight images of 'state' (None if it cannot occur in a game)"""
+    cells = state.moves(state.turn) + state.moves(3 - state.turn)
+    seg = (state.n1, state.n2) if state.turn == 1 else (state.n2, state.n1)
+    if seg not in SEGMENT_OFFSET:
+        return None
+    return SEGMENT_OFFSET[seg] + min(rank([image[c] for c in cells]) for image in TRANSFORMS)
+
+
+def canonical_rank_array(cells: np.ndarray) -> np.ndarray:
+    """Smallest rank among the eight images of each row of 'cells' (shape (N, k), mover's marks first)"""
+    return np.minimum.reduce([rank_array(TRANSFORM_ARRAY[t][cells]) for t in range(len(TRANSFORMS))])
@@ -0,0 +1,135 @@
+"""
+Read-only access to the table written by engine.solver.
+
+The file is opened with mmap, so opening it costs nothing up front, every lookup is one byte read at the
+position's index, and the pages are shared by every session and every process that opens the same file.
+"""
+
+import mmap
+import os
+import struct
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from engine.board import completes_line
+from engine.index import TOTAL_STATES, state_index
+from engine.state import State
+from engine.symmetry import canonical_index
+
+
+"""
+File format: a HEADER_SIZE-byte header followed by one byte per position, in engine.index order.
+
+    0            draw (neither side can force a win)
+    odd  n       the player to move wins in n plies
+    even n       the player to move loses in n plies
+
+The compact format (COMPACT_VERSION, written by 'python -m engine.solver --compact') keeps only the canonical
+position of each symmetry class (engine.symmetry.canonical_index): after the header come the sorted canonical
+indices as uint32, then one value byte per index in the same order. It is about 8x fewer positions.
+"""
+MAGIC = b"TTT4SOLV"
+VERSION = 1
+COMPACT_VERSION = 2
+HEADER = struct.Struct("<8sIIQ")        # magic, version, longest result in plies, number of positions
+HEADER_SIZE = 64                        # the values start at a fixed, aligned offset
+
+DRAW = 0
+
+
+def decode(value: int) -> Tuple[str, int]:
+    """Return ('win' | 'loss' | 'draw', plies) for a stored value, from the point of view of the player to move"""
+    if value == DRAW:
+        return "draw", 0
+    return ("win" if value % 2 else "loss"), value
+
+
+class SolvedTable:
+    def __init__(self, path: str) -> None:
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, longest, count = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version not in (VERSION, COMPACT_VERSION):
+            raise ValueError(f"{path} is not a solved table (version {VERSION} or {COMPACT_VERSION}).")
+        if version == VERSION and (count != TOTAL_STATES or len(self._mmap) < HEADER_SIZE + count):
+            raise ValueError(f"{path} is incomplete: expected {TOTAL_STATES:,} positions.")
+        if version == COMPACT_VERSION and len(self._mmap) < HEADER_SIZE + 5 * count:
+            raise ValueError(f"{path} is incomplete: expected {count:,} positions.")
+        if longest == 0:
+            raise ValueError(f"{path} is still being solved.")
+        self.path = path
+        self.version = version
+        self.longest = longest
+        self.count = count
+        if version == COMPACT_VERSION:
+            self._indices = np.frombuffer(self._mmap, dtype=np.uint32, count=count, offset=HEADER_SIZE)
+            self._values_offset = HEADER_SIZE + 4 * count
+
+    def close(self) -> None:
+        if self.version == COMPACT_VERSION:
+            del self._indices               # the mmap cannot close while numpy holds a view of it
+        self._mmap.close()
+
+    def _lookup(self, state: State) -> int:
+        if self.version == VERSION:
+            return self._mmap[HEADER_SIZE + state_index(state)]
+        index = canonical_index(state)
+        i = int(np.searchsorted(self._indices, np.uint32(index)))     # a Python int would copy the array to int64
+        if i == self.count or self._indices[i] != index:
+            raise ValueError(f"{self.path} has no entry for {state}.")
+        return self._mmap[self._values_offset + i]
+
+    def value(self, state: State | int) -> int:
+        """
+        Value of a position for the player to move (see decode).
+
+        :param state: a State or its packed key
+        """
+        if isinstance(state, int):
+            state = State.from_key(state)
+        if state_index(state) is None:
+            raise ValueError(f"{state} cannot occur in a game.")
+        return self._lookup(state)
+
+    def best_move(self, state: State) -> int:
+        """
+        Return a move with the best value for the player to move:
+        the fastest win, otherwise a draw, otherwise the slowest loss.
+        """
+        player = state.turn
+        best_cell, best_score = None, None
+        for cell in state.legal_moves():
+            child = state.play(cell)
+            if completes_line(child.mask(player), cell):
+                return cell
+
+            value = self._lookup(child)
+            if value == DRAW:
+                score = 0
+            elif value % 2 == 0:          # the opponent loses in 'value' plies
+                score = 1000 - value
+            else:                         # the opponent wins in 'value' plies
+                score = value - 1000
+
+            if best_score is None or score > best_score:
+                best_cell, best_score = cell, score
+        return best_cell
+
+
+_open_tables: Dict[str, SolvedTable] = {}
+_open_lock = threading.Lock()
+
+
+def open_table(path: str) -> Optional[SolvedTable]:
+    """
+    Open a solved table once per process and return the shared instance (None if the file does not exist).
+    Only opened tables are kept, so a table solved while the app runs is picked up at the next call.
+    """
+    with _open_lock:
+        table = _open_tables.get(path)
+        if table is None and os.path.exists(path):
+            table = _open_tables[path] = SolvedTable(path)
+        return table
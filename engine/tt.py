@@ -0,0 +1,136 @@
+"""Fixed-size transposition table with two-slot buckets (depth-preferred + always-replace)"""
+
+from typing import Dict, List, Optional, Tuple
+
+from engine.state import State
+from engine.symmetry import TRANSFORMS, INVERSE, canonical_key
+
+
+# bound types
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# an entry is packed into one int: depth (8 bits) | bound (2 bits) | move + 1 (5 bits, 0 = no move) | score
+_SCORE_OFFSET = 1 << 15
+_SCORE_SHIFT = 15
+
+# spreads canonical keys over the buckets (Fibonacci hashing); the Zobrist hash is not symmetric
+_GOLDEN = 0x9E3779B97F4A7C15
+
+
+def _pack(depth: int, bound: int, score: int, move: Optional[int]) -> int:
+    return depth | bound << 8 | (0 if move is None else move + 1) << 10 | (score + _SCORE_OFFSET) << _SCORE_SHIFT
+
+
+def _unpack(data: int) -> Tuple[int, int, int, Optional[int]]:
+    move = data >> 10 & 0x1F
+    return data & 0xFF, data >> 8 & 0b11, (data >> _SCORE_SHIFT) - _SCORE_OFFSET, move - 1 if move else None
+
+
+class TranspositionTable:
+    """
+    Bounded cache of search results, indexed by the State's Zobrist hash and verified with its exact packed key.
+
+    Each bucket has two slots: the first keeps the deepest result seen for the bucket, the second always takes
+    the latest store. Memory is fixed by 'entries' (rounded down to a power of two), whatever the search length.
+
+    With 'canonical' the eight symmetric images of a position share one entry (see engine.symmetry): the entry is
+    keyed on the canonical key, and its move is stored in the canonical frame and mapped back on probe. This needs
+    fewer nodes for the same depth, but each node pays for the canonicalization, so it is off by default.
+
+    :param entries: number of entries (two per bucket)
+    :param canonical: share entries between symmetric positions
+    """
+    def __init__(self, entries: int = 1 << 16, canonical: bool = False) -> None:
+        buckets = 1 << max(0, (entries // 2).bit_length() - 1)
+        self.entries = 2 * buckets
+        self.canonical = canonical
+        self._bucket_mask = buckets - 1
+        self._bucket_shift = 64 - (buckets.bit_length() - 1)
+        self._canonical: Dict[int, Tuple[int, int]] = {}      # key -> (canonical key, transform), same bound as the table
+        self._keys: List[Optional[int]] = [None] * self.entries
+        self._data: List[int] = [0] * self.entries
+        self.clear_stats()
+
+    def clear_stats(self) -> None:
+        self.probes = 0
+        self.hits = 0
+        self.collisions = 0              # misses where the bucket held other positions
+        self.stores = 0
+        self.replacements = 0            # stores that evicted another position
+
+    def clear(self) -> None:
+        self._keys = [None] * self.entries
+        self._data = [0] * self.entries
+        self._canonical.clear()
+        self.clear_stats()
+
+    def _locate(self, state: State) -> Tuple[int, int, int]:
+        """Return (first slot of the bucket, key, transform from 'state' to the stored frame)"""
+        key = state.key
+        if not self.canonical:
+            return (state.zobrist & self._bucket_mask) << 1, key, 0
+
+        found = self._canonical.get(key)
+        if found is None:
+            if len(self._canonical) >= self.entries:
+                self._canonical.clear()
+            found = self._canonical[key] = canonical_key(state)
+        key, t = found
+        return ((key * _GOLDEN & 0xFFFFFFFFFFFFFFFF) >> self._bucket_shift & self._bucket_mask) << 1, key, t
+
+    def probe(self, state: State) -> Optional[Tuple[int, int, int, Optional[int]]]:
+        """Return (depth, bound, score, move) stored for this position (or a symmetric one), or None"""
+        self.probes += 1
+        i, key, t = self._locate(state)
+        keys = self._keys
+        if keys[i] != key:
+            i += 1
+            if keys[i] != key:
+                if keys[i - 1] is not None or keys[i] is not None:
+                    self.collisions += 1
+                return None
+
+        self.hits += 1
+        depth, bound, score, move = _unpack(self._data[i])
+        if t and move is not None:
+            move = TRANSFORMS[INVERSE[t]][move]
+        return depth, bound, score, move
+
+    def store(self, state: State, depth: int, bound: int, score: int, move: Optional[int]) -> None:
+        self.stores += 1
+        i, key, t = self._locate(state)
+        if t and move is not None:
+            move = TRANSFORMS[t][move]
+        data = _pack(depth, bound, score, move)
+
+        keys = self._keys
+        if keys[i] is None or keys[i] == key or depth >= self._data[i] & 0xFF:
+            # depth-preferred slot: the previous occupant moves to the always-replace slot
+            if keys[i] is not None and keys[i] != key:
+                self._evict(i + 1, key)
+                keys[i + 1], self._data[i + 1] = keys[i], self._data[i]
+            elif keys[i + 1] == key:
+                keys[i + 1] = None
+            keys[i], self._data[i] = key, data
+        else:
+            self._evict(i + 1, key)
+            keys[i + 1], self._data[i + 1] = key, data
+
+    def _evict(self, slot: int, key: int) -> None:
+        if self._keys[slot] is not None and self._keys[slot] != key:
+            self.replacements += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Counters for sizing the table"""
+        used = sum(key is not None for key in self._keys)
+        return {
+            "entries": self.entries,
+            "used": used,
+            "fill": used / self.entries,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "replacements": self.replacements,
+        }
@@ -0,0 +1,35 @@
+"""
+Zobrist hashing of the disappearing-mark state, including the age order of the marks.
+
+A player's FIFO of marks q0 (oldest) .. qk is hashed as HEAD[q0] ^ LINK[q0][q1] ^ ... ^ LINK[qk-1][qk], which
+determines the sequence. Adding a mark XORs one LINK, and expiring the oldest mark swaps HEAD[q0] ^ LINK[q0][q1] for
+HEAD[q1], so both updates are O(1) and the hash depends only on the position, not on how it was reached.
+"""
+
+import random
+
+from engine.board import SIZE
+
+
+CELLS = SIZE * SIZE
+
+_rng = random.Random(0x7A11)          # fixed seed: hashes are stable across processes and runs
+
+
+def _random_key() -> int:
+    return _rng.getrandbits(64)
+
+
+HEAD = {player: [_random_key() for _ in range(CELLS)] for player in (1, 2)}
+LINK = {player: [[_random_key() for _ in range(CELLS)] for _ in range(CELLS)] for player in (1, 2)}
+TURN = _random_key()                  # XORed in when player 2 is to move
+
+
+def hash_moves(player: int, moves: list) -> int:
+    """Hash of one player's marks, oldest first"""
+    if not moves:
+        return 0
+    h = HEAD[player][moves[0]]
+    for older, newer in zip(moves, moves[1:]):
+        h ^= LINK[player][older][newer]
+    return h
@@ -0,0 +1,55 @@
+"""BatchEngine against GameEngine, move by move"""
+
+import numpy as np
+import pytest
+
+from engine.batch import BatchEngine
+from engine.core import DEFAULT_DRAW_RULE, DrawRule, GameEngine
+
+
+# each player cycles through five cells that hold no line, so the same positions come back every ten moves
+CYCLES = {1: (0, 1, 2, 4, 5), 2: (10, 11, 13, 14, 15)}
+
+
+@pytest.mark.parametrize("draw_rule", [DEFAULT_DRAW_RULE, DrawRule(repetitions=2, max_moves=0),
+                                       DrawRule(repetitions=0, max_moves=25), DrawRule(repetitions=0, max_moves=0)])
+def test_batch_matches_game_engine(draw_rule):
+    games = 200
+    rng = np.random.default_rng(0)
+    batch = BatchEngine(games, draw_rule)
+    engines = [GameEngine(draw_rule=draw_rule) for _ in range(games)]
+
+    while batch.active.any() and batch.moves_played < 300:
+        moves = batch.random_moves(rng)
+        # every fourth game repeats positions
+        ply = batch.moves_played
+        moves[::4] = CYCLES[ply % 2 + 1][ply // 2 % 5]
+        for game, engine in enumerate(engines):
+            if not engine.is_over:
+                engine.apply_move(int(moves[game]))
+        batch.step(moves)
+
+        keys = batch.keys()
+        history = batch._history[:batch.moves_played + 1]
+        for game, engine in enumerate(engines):
+            assert keys[game] == engine.state.key
+            assert batch.winner[game] == (engine.winner or 0)
+            assert batch.draw[game] == engine.draw
+            assert batch.lengths[game] == engine.moves_played
+            assert batch.active[game] == (not engine.is_over)
+            # the repetition count of the current position, from the positions the game went through
+            seen = history[:engine.moves_played + 1, game]
+            assert (seen == keys[game]).sum() == engine.repetitions.get(engine.state.key, 1)
+        assert batch.boards().tolist() == [engine.to_board() for engine in engines]
+        legal = batch.legal_mask()
+        assert [np.flatnonzero(row).tolist() for row in legal] == [engine.legal_moves() for engine in engines]
+
+    if draw_rule.max_moves:
+        assert not batch.active.any()
+
+
+def test_step_rejects_occupied_cells():
+    batch = BatchEngine(2)
+    batch.step(np.array([0, 5]))
+    with pytest.raises(ValueError):
+        batch.step(np.array([1, 5]))
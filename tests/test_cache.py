@@ -0,0 +1,132 @@
+"""ResponseCache (LRU, TTL, stats, SQLite backing) and the normalized prompt keys of the LLM response cache"""
+
+import json
+
+import pytest
+
+from components.cache import ResponseCache, prompt_key
+from components.game import Prompt
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2, ttl_seconds=0)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"           # 'a' is now the most recently used
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+
+
+def test_ttl_expiry():
+    clock = Clock()
+    cache = ResponseCache(ttl_seconds=60, clock=clock)
+    cache.put("a", "1")
+    clock.now += 59
+    assert cache.get("a") == "1"
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["entries"] == 0
+
+    forever = ResponseCache(ttl_seconds=0, clock=clock)
+    forever.put("a", "1")
+    clock.now += 10 ** 9
+    assert forever.get("a") == "1"
+
+
+def test_stats():
+    cache = ResponseCache()
+    assert cache.stats()["hit_rate"] == 0.0
+    cache.put("a", "1")
+    cache.get("a"), cache.get("a"), cache.get("b")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    assert stats["hit_rate"] == pytest.approx(2 / 3)
+    cache.clear()
+    assert cache.stats()["hits"] == 0 and cache.get("a") is None
+
+
+def test_sqlite_backing(tmp_path):
+    path, clock = str(tmp_path / "cache.sqlite"), Clock()
+    cache = ResponseCache(max_entries=1, ttl_seconds=60, path=path, clock=clock)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.stats()["evictions"] == 1
+    assert cache.get("a") == "1"           # evicted from memory, read back from the file
+
+    reopened = ResponseCache(ttl_seconds=60, path=path, clock=clock)
+    assert (reopened.get("a"), reopened.get("b")) == ("1", "2")
+
+    # another table in the same file shares nothing
+    positions = ResponseCache(ttl_seconds=60, path=path, table="positions", clock=clock)
+    assert positions.get("a") is None
+    positions.put("a", "9")
+    positions.clear()
+    assert ResponseCache(path=path, clock=clock).get("a") == "1"
+
+    # rows past the TTL are purged when the file is opened
+    clock.now += 61
+    assert ResponseCache(ttl_seconds=0, path=path, clock=clock).get("a") == "1"
+    ResponseCache(ttl_seconds=60, path=path, clock=clock)
+    assert ResponseCache(ttl_seconds=0, path=path, clock=clock).get("a") is None
+
+
+def test_invalid_table_name(tmp_path):
+    with pytest.raises(ValueError):
+        ResponseCache(path=str(tmp_path / "cache.sqlite"), table="responses; DROP TABLE responses")
+
+
+def prompt(result_time="2026-01-01T00:00:00", call_id="call_1", arguments='{"row": 1, "col": 2}', canva="...."):
+    return Prompt(
+        messages=[
+            {"role": "system", "content": "Main Goals: win"},
+            {"role": "user", "content": f"Current canva: {canva}"},
+            {"role": "assistant", "content": "", "tool_calls": [
+                {"id": call_id, "type": "function", "function": {"name": "move", "arguments": arguments}}]},
+            {"role": "user", "content": json.dumps({"tool_executed": True, "result": "ok", "timestamp": result_time})},
+        ],
+        tools=[{"type": "function", "function": {"name": "move", "parameters": {"type": "object"}}}],
+    )
+
+
+def test_prompt_key_ignores_volatile_fields_and_ordering():
+    key = prompt_key("model", prompt())
+    assert prompt_key("model", prompt(result_time="2026-06-01T12:00:00", call_id="call_2")) == key
+    assert prompt_key("model", prompt(arguments='{"col": 2, "row": 1}')) == key
+    reordered = prompt()
+    reordered.messages[0] = {"content": "Main Goals: win", "role": "system"}
+    reordered.tools[0] = {"function": {"parameters": {"type": "object"}, "name": "move"}, "type": "function"}
+    assert prompt_key("model", reordered) == key
+
+
+def test_prompt_key_changes_with_what_is_asked():
+    key = prompt_key("model", prompt())
+    assert prompt_key("other-model", prompt()) != key
+    assert prompt_key("model", prompt(canva="X...")) != key
+    assert prompt_key("model", prompt(arguments='{"row": 2, "col": 2}')) != key
+
+
+def test_prompt_key_falls_back_on_text_that_is_not_json():
+    # brace-wrapped text and cut tool-call arguments are hashed as they are
+    def with_content(content):
+        p = prompt()
+        p.messages[1] = {"role": "user", "content": content}
+        return p
+    braces = with_content("{row: 1}")
+    assert prompt_key("model", braces) == prompt_key("model", with_content("{row: 1}"))
+    assert prompt_key("model", braces) != prompt_key("model", with_content("{row: 2}"))
+    assert prompt_key("model", prompt(arguments='{"row": 1, ')) != prompt_key("model", prompt())
+
+    # values that JSON cannot encode are hashed through str()
+    odd = prompt()
+    odd.messages.append({"role": "user", "content": {"value": {1, 2}}})
+    assert prompt_key("model", odd) == prompt_key("model", odd)
@@ -0,0 +1,60 @@
+"""The compact board encoding and tool results sent to the LLM, and their size against the former numpy-repr query"""
+
+import json
+
+from ai_player import agent_query
+from components.game import AgentFunctionCallingActionLanguage, Environment, estimate_tokens
+from engine.core import GameEngine
+from engine.state import State
+
+
+def played(*cells):
+    engine = GameEngine()
+    for cell in cells:
+        engine.apply_move(cell)
+    return engine
+
+
+# player 1: 0, 4, 5, 6; player 2: 15, 14, 13, 11 (both have four marks: cells 0 and 15 go next)
+FULL = (0, 15, 4, 14, 5, 13, 6, 11)
+
+
+def test_state_encoding():
+    assert State().to_compact() == "..../..../..../...."
+    assert State().play(5).play(10).to_compact() == "..../.X../..O./...."
+    state = played(*FULL).state
+    assert state.to_compact() == "x.../XXX./...O/.OOo"
+    assert state.to_compact(mark_expiring=False) == "X.../XXX./...O/.OOO"
+
+
+def test_engine_encoding_hides_expiring_marks_once_over():
+    engine = played(*FULL)
+    assert engine.to_compact() == "x.../XXX./...O/.OOo"
+    assert engine.apply_move(7) == 1       # cell 0 is removed and player 1 completes row 1
+    assert engine.to_compact() == "..../XXXX/...O/.OOO"
+
+
+def test_format_result():
+    language, environment = AgentFunctionCallingActionLanguage(), Environment()
+    assert language.format_result(environment.format_result("Implemented a move at [1, 1]")) == \
+        "Implemented a move at [1, 1]"
+    assert language.format_result(environment.format_result({"row": 1})) == '{"row": 1}'
+    assert language.format_result(environment.format_result({1, 2})) == "{1, 2}"       # not JSON: its text
+    assert language.format_result({"tool_executed": False, "error": "Cell (1, 1) is not available.",
+                                   "traceback": "Traceback..."}) == "Error: Cell (1, 1) is not available."
+    assert language.format_result({"tool_executed": False, "message": "No tool used."}) == "No tool used."
+
+
+def test_turn_is_smaller_than_the_numpy_query():
+    engine = played(*FULL)
+    old_query = f"The current canva is {engine.state.to_board()}. Please implement your next move."
+    new_query = agent_query(engine)
+    assert new_query == "Current canva: x.../XXX./...O/.OOo. Implement your next move."
+    old, new = estimate_tokens({"role": "user", "content": old_query}), estimate_tokens({"role": "user", "content": new_query})
+    assert new < old, (new, old)
+
+    # a tool result went into memory as the whole result dict
+    result = Environment().format_result("Implemented a move at [1, 1]")
+    old = estimate_tokens({"role": "user", "content": json.dumps(result)})
+    new = estimate_tokens({"role": "user", "content": AgentFunctionCallingActionLanguage().format_result(result)})
+    assert new < old, (new, old)
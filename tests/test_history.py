@@ -0,0 +1,99 @@
+"""MoveLog seeking (keyframe + replay) against replaying the whole game from the first position"""
+
+import random
+
+import pytest
+
+from engine.board import SIZE
+from engine.history import KEYFRAME_INTERVAL, MoveLog
+from engine.state import State
+
+
+# around the first three keyframes, and the very first and last moves
+CHECKED = sorted({0, 1} | {k * KEYFRAME_INTERVAL + d for k in (1, 2, 3) for d in (-2, -1, 0, 1)})
+
+
+def random_cells(count, seed):
+    """Cells of a random game of 'count' moves (wins are ignored: only the log's bookkeeping is tested)"""
+    rng, state, cells = random.Random(seed), State(), []
+    for _ in range(count):
+        cells.append(rng.choice(state.legal_moves()))
+        state = state.play(cells[-1])
+    return cells
+
+
+def replay(cells, start=None):
+    """States after each move, replayed from 'start'"""
+    state, states = start or State(), []
+    for cell in cells:
+        state = state.play(cell)
+        states.append(state)
+    return states
+
+
+def replay_legal(start, cells):
+    """Replace the moves that are illegal after 'start' by the first free cell"""
+    state, legal = start, []
+    for cell in cells:
+        if cell not in state.legal_moves():
+            cell = state.legal_moves()[0]
+        legal.append(cell)
+        state = state.play(cell)
+    return legal
+
+
+def recorded(cells, start=None):
+    log = MoveLog(start)
+    for cell in cells:
+        log.record(cell)
+    return log
+
+
+def check(log, states, cells):
+    assert len(log) == len(states)
+    for i in {i for i in CHECKED if i < len(states)} | ({len(states) - 1} if states else set()):
+        assert log.state(i) == states[i], i
+        player, (row, col) = log.move(i)
+        assert row * SIZE + col == cells[i]
+        assert player == (states[i - 1] if i else log.state(-1)).turn
+        assert log.board(i) == states[i].to_canva()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_state_matches_replay(seed):
+    cells = random_cells(3 * KEYFRAME_INTERVAL + 5, seed)
+    check(recorded(cells), replay(cells), cells)
+
+
+def test_second_player_first():
+    start = State().play(5)
+    cells = random_cells(2 * KEYFRAME_INTERVAL + 3, seed=9)
+    cells = replay_legal(start, cells)
+    log = recorded(cells, start)
+    assert log.move(0)[0] == 2
+    check(log, replay(cells, start), cells)
+
+
+@pytest.mark.parametrize("length", [0, 1, KEYFRAME_INTERVAL - 1, KEYFRAME_INTERVAL, KEYFRAME_INTERVAL + 1,
+                                    2 * KEYFRAME_INTERVAL, 3 * KEYFRAME_INTERVAL + 5])
+def test_truncate_then_record(length):
+    cells = random_cells(3 * KEYFRAME_INTERVAL + 5, seed=length)
+    log = recorded(cells)
+    log.over = True
+    log.truncate(length)
+    assert not log.over
+    check(log, replay(cells[:length]), cells[:length])
+
+    # play on from the cut: seeking must not use the keyframes of the undone moves
+    more = replay_legal(replay(cells[:length])[-1] if length else State(), random_cells(2 * KEYFRAME_INTERVAL, seed=100))
+    for cell in more:
+        log.record(cell)
+    check(log, replay(cells[:length] + more), cells[:length] + more)
+
+
+def test_truncate_out_of_range():
+    log = recorded(random_cells(3, seed=0))
+    with pytest.raises(ValueError):
+        log.truncate(4)
+    with pytest.raises(ValueError):
+        log.truncate(-1)
@@ -0,0 +1,195 @@
+"""LLMClient (retries with jittered backoff, p95 hedging, deadline), and the native engine playing when the LLM fails"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from components import model
+from components.model import LLMClient, LLMUnavailable
+
+
+class FakeRequest:
+    """A request coroutine function: each call plays the next (delay, outcome) of 'script' (outcome: value or exception)"""
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = []            # time left given to each call
+        self.cancelled = 0
+
+    async def __call__(self, timeout):
+        delay, outcome = self.script[min(len(self.calls), len(self.script) - 1)]
+        self.calls.append(timeout)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def client():
+    clients = []
+
+    def make(**kwargs):
+        clients.append(LLMClient(**kwargs))
+        return clients[-1]
+    yield make
+    for c in clients:
+        c._loop.call_soon_threadsafe(c._loop.stop)
+
+
+def transient():
+    return httpx.ConnectError("connection refused")
+
+
+def test_first_success_is_returned(client):
+    request = FakeRequest((0, "answer"))
+    llm = client(timeout_s=5)
+    assert llm.run_sync(request) == "answer"
+    assert len(request.calls) == 1 and 0 < request.calls[0] <= 5
+    assert llm.stats()["retried"] == 0
+
+
+def test_transient_errors_are_retried_with_jittered_backoff(client, monkeypatch):
+    waits = []
+    monkeypatch.setattr(model.random, "uniform", lambda low, high: waits.append((low, high)) or 0.0)
+    request = FakeRequest((0, transient()), (0, transient()), (0, "answer"))
+    llm = client(timeout_s=5, retries=2, backoff_s=0.1)
+    assert llm.run_sync(request) == "answer"
+    assert len(request.calls) == 3
+    assert waits == [(0, 0.1), (0, 0.2)]             # attempt n waits a random time in [0, backoff_s * 2**n]
+    assert llm.stats()["retried"] == 2
+
+
+def test_retries_run_out(client):
+    request = FakeRequest((0, transient()))
+    llm = client(timeout_s=5, retries=2, backoff_s=0.01)
+    with pytest.raises(LLMUnavailable, match="failed"):
+        llm.run_sync(request)
+    assert len(request.calls) == 3
+
+
+def test_other_errors_are_not_retried(client):
+    request = FakeRequest((0, ValueError("bad request")))
+    llm = client(timeout_s=5, retries=2, backoff_s=0.01)
+    with pytest.raises(ValueError):
+        llm.run_sync(request)
+    assert len(request.calls) == 1
+
+
+def test_deadline_raises_llm_unavailable(client):
+    request = FakeRequest((5, "too late"))
+    llm = client(timeout_s=0.2)
+    started = time.perf_counter()
+    with pytest.raises(LLMUnavailable, match="did not answer"):
+        llm.run_sync(request)
+    assert time.perf_counter() - started < 1
+    assert llm.stats()["timeouts"] == 1
+    time.sleep(0.05)
+    assert request.cancelled == 1
+
+
+def test_backoff_past_the_deadline_gives_up(client, monkeypatch):
+    monkeypatch.setattr(model.random, "uniform", lambda low, high: high)
+    request = FakeRequest((0, transient()))
+    llm = client(timeout_s=0.5, retries=5, backoff_s=1)
+    started = time.perf_counter()
+    with pytest.raises(LLMUnavailable):
+        llm.run_sync(request)
+    assert time.perf_counter() - started < 0.4
+    assert len(request.calls) == 1
+
+
+def test_hedge_delay_is_the_recent_p95(client):
+    llm = client(min_samples=20)
+    llm._latencies.extend([0.01] * 19)
+    assert llm.hedge_delay() is None                  # too few samples
+    llm._latencies.extend([0.01] * 80 + [1.0] * 5)
+    assert llm.hedge_delay() == 0.01
+    llm._latencies.extend([1.0] * 10)
+    assert llm.hedge_delay() == 1.0
+    assert client(hedge=False, min_samples=0).hedge_delay() is None
+
+
+def test_slow_request_is_hedged_and_the_first_answer_wins(client):
+    llm = client(timeout_s=5, min_samples=20)
+    llm._latencies.extend([0.05] * 20)
+    request = FakeRequest((2, "slow"), (0, "hedge"))
+    started = time.perf_counter()
+    assert llm.run_sync(request) == "hedge"
+    assert time.perf_counter() - started < 1
+    assert len(request.calls) == 2
+    stats = llm.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    time.sleep(0.05)
+    assert request.cancelled == 1                     # the slow request is cancelled
+
+
+def test_no_hedge_when_disabled_or_fast(client):
+    llm = client(timeout_s=5, min_samples=20)
+    llm._latencies.extend([0.05] * 20)
+    fast = FakeRequest((0, "fast"))
+    assert llm.run_sync(fast) == "fast" and len(fast.calls) == 1
+
+    slow = FakeRequest((0.3, "slow"), (0, "hedge"))
+    assert llm.run_sync(slow, hedge=False) == "slow"
+    assert len(slow.calls) == 1 and llm.stats()["hedged"] == 0
+
+
+def test_failed_first_request_leaves_the_hedge_running(client):
+    llm = client(timeout_s=5, min_samples=20)
+    llm._latencies.extend([0.05] * 20)
+    request = FakeRequest((0.2, ValueError("broken")), (0.3, "hedge"))
+    assert llm.run_sync(request) == "hedge"
+
+
+class SlowStub(BaseHTTPRequestHandler):
+    """An OpenAI-compatible server that answers after the client's deadline"""
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(3)
+        body = json.dumps({"error": {"message": "late"}}).encode()
+        try:
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_llm(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowStub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(model, "MODEL", "openai/stub")
+    monkeypatch.setattr(model, "LLM_API_BASE", f"http://127.0.0.1:{server.server_port}/v1")
+    monkeypatch.setattr(model.llm_client, "timeout_s", 0.5)
+    yield
+    server.shutdown()
+
+
+def test_native_engine_plays_when_the_llm_misses_its_deadline(slow_llm):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file("../app.py", default_timeout=60)
+    at.run()
+    assert at.session_state["ai_backend"] == "LLM"
+    at.button(key="0_0").click().run()
+    assert not at.exception
+    moves = at.session_state["game_history"].moves()
+    assert [player for player, _ in moves] == [1, 2]
+    assert any("did not answer" in toast.value and "native engine played" in toast.value for toast in at.toast)
@@ -0,0 +1,84 @@
+"""Agent Memory: the token-budgeted window, assistant/result units and the current task"""
+
+from components.game import Memory, estimate_tokens
+
+
+def task(i):
+    return {"role": "user", "content": f"Current canva: {'.' * 16} (turn {i})"}
+
+
+def assistant(i):
+    return {"role": "assistant", "content": f"I play turn {i}", "tool_calls": [{"function": {"name": "move"}}]}
+
+
+def result(i):
+    return {"role": "user", "content": f"Implemented a move (turn {i})"}
+
+
+def play(memory, turns, start=0):
+    for i in range(start, start + turns):
+        memory.add_memory(task(i), task=True)
+        memory.add_memory(assistant(i))
+        memory.add_memory(result(i))
+
+
+def check_units(window):
+    """Every result follows its assistant message, so the window never starts on an orphan result"""
+    for i, item in enumerate(window):
+        if item["content"].startswith("Implemented"):
+            assert i > 0 and window[i - 1]["role"] == "assistant", window
+
+
+def test_window_keeps_the_newest_units_within_budget():
+    memory = Memory(max_history=10 ** 6)
+    play(memory, 20)
+    newest = [item for i in (17, 18, 19) for item in (task(i), assistant(i), result(i))]
+    budget = sum(map(estimate_tokens, newest))
+    assert memory.get_memories(budget) == newest
+    # room for turn 16's result but not its assistant message: neither is sent
+    assert memory.get_memories(budget + estimate_tokens(result(16))) == newest
+    # one token short: the oldest of those units no longer fits
+    assert memory.get_memories(budget - 1) == newest[1:]
+    assert memory.get_memories() == memory.items      # everything fits in the default budget
+
+
+def test_assistant_and_result_are_kept_or_dropped_together():
+    memory = Memory()
+    play(memory, 30)
+    items = memory.items
+    for budget in range(1, sum(map(estimate_tokens, items)) + 1, 7):
+        window = memory.get_memories(budget)
+        check_units(window)
+        assert window == items[-len(window):] or window[0] == task(29)
+
+
+def test_current_task_is_always_sent():
+    memory = Memory()
+    play(memory, 5)
+    memory.add_memory(task(5), task=True)
+    memory.add_memory(assistant(5))
+    memory.add_memory(result(5))
+    # the budget only fits the newest unit: the task of this turn is added anyway
+    window = memory.get_memories(1)
+    assert window == [task(5), assistant(5), result(5)]
+
+
+def test_aborted_turn_does_not_swallow_the_next_task():
+    memory = Memory()
+    play(memory, 3)
+    memory.add_memory(task(3), task=True)
+    memory.add_memory(assistant(3))                   # the turn failed before the result was added
+    memory.add_memory(task(4), task=True)
+    assert memory.units[-1][0] == [task(4)]
+    assert memory.units[-2][0] == [assistant(3)]
+    assert memory.get_memories(1) == [task(4)]
+    memory.add_memory(assistant(4))
+    memory.add_memory(result(4))
+    assert memory.get_memories(1) == [task(4), assistant(4), result(4)]
+
+
+def test_storage_is_bounded():
+    memory = Memory(max_units=10)
+    play(memory, 20)
+    assert len(memory.units) == 10
+    assert memory.items[-1] == result(19)
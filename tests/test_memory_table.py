@@ -0,0 +1,30 @@
+"""MemoryTable (the Memory tab's transcript): content formatting, and rows read back after spilling to disk"""
+
+import json
+
+from utils_st import MemoryTable
+
+
+def test_malformed_brace_content_is_kept():
+    table = MemoryTable(directory=None)
+    table.append("agent", {"role": "assistant", "content": "{row: 1}", "time": "0"})
+    table.append("agent", {"role": "assistant", "content": "{", "time": "0"})
+    assert [row["content"] for row in table.rows(0, 2)] == ["{row: 1}", "{"]
+
+
+def test_tool_results_show_their_value():
+    table = MemoryTable(directory=None)
+    table.append("agent", {"role": "user", "content": json.dumps({"tool_executed": True, "result": "Implemented"})})
+    table.append("agent", {"role": "user", "content": json.dumps({"tool_executed": False, "message": "No tool"})})
+    table.append("agent", {"role": "user", "content": "plain text"})
+    assert [row["content"] for row in table.rows(0, 3)] == ["Implemented", "No tool", "plain text"]
+
+
+def test_spilled_rows_read_back(tmp_path):
+    table = MemoryTable(max_rows=4, directory=str(tmp_path))
+    contents = [f"{{move {i}}}" if i % 2 else f"move {i}" for i in range(11)]
+    for content in contents:
+        table.append("agent", {"role": "assistant", "content": content})
+    assert table.spilled > 0
+    assert len(table) == len(contents)
+    assert [row["content"] for row in table.rows(0, len(contents))] == contents
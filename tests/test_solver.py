@@ -0,0 +1,172 @@
+"""Perfect index (rank / unrank) and the retrograde solver's chunk pass, against search on small cases"""
+
+import random
+from functools import lru_cache
+
+import numpy as np
+import pytest
+
+from engine import solver
+from engine.board import completes_line
+from engine.core import DrawRule
+from engine.index import (SEGMENTS, SEGMENT_OFFSET, SEGMENT_SIZE, TOTAL_STATES, index_state, rank, rank_array,
+                          segment_of, state_index, unrank, unrank_array)
+from engine.search import Searcher, WIN_SCORE
+from engine.state import State
+
+
+def sample_indices(count, seed=0):
+    """'count' random indices per segment, plus the first and last of each segment"""
+    rng = random.Random(seed)
+    return {seg: [0, SEGMENT_SIZE[seg] - 1] + [rng.randrange(SEGMENT_SIZE[seg]) for _ in range(count)]
+            for seg in SEGMENTS}
+
+
+def test_rank_unrank_round_trip():
+    for seg, indices in sample_indices(300).items():
+        length = sum(seg)
+        for index in indices:
+            cells = unrank(index, length)
+            assert len(set(cells)) == length
+            assert rank(cells) == index
+
+
+def test_rank_array_matches_scalar():
+    for seg, indices in sample_indices(300, seed=1).items():
+        length = sum(seg)
+        index = np.array(indices, dtype=np.int64)
+        cells = unrank_array(index, length)
+        assert cells.tolist() == [unrank(i, length) for i in indices]
+        assert rank_array(cells).tolist() == indices
+        if length > 1:
+            # the partial rank of a prefix plus the last digit (weight 1: free cells below the last one) is the rank,
+            # as the solver ranks the successors' shared prefix once
+            prefix = rank_array(cells[:, :-1], length)
+            last = [row[-1] - sum(cell < row[-1] for cell in row[:-1]) for row in cells.tolist()]
+            assert (prefix + np.array(last) == index).all()
+
+
+def test_state_index_round_trip():
+    for seg, indices in sample_indices(100, seed=2).items():
+        for index in indices:
+            index += SEGMENT_OFFSET[seg]
+            assert segment_of(index) == seg
+            state = index_state(index)
+            assert state_index(state) == index
+            if seg == (4, 4):
+                assert state_index(index_state(index, turn=2)) == index
+    assert segment_of(TOTAL_STATES - 1) == (4, 4)
+
+
+# * -------------------------------------------------------------------------------
+# * Solver
+
+MAX_PLY = 4
+
+
+def immediate_win(state):
+    return any(completes_line(state.play(cell).mask(state.turn), cell) for cell in state.legal_moves())
+
+
+@lru_cache(maxsize=None)
+def truncated_value(state, plies):
+    """The solver's label of 'state' if it is at most 'plies', else 0 (plain recursion on State)"""
+    if immediate_win(state):
+        return 1
+    if plies < 2:
+        return 0
+    values = [truncated_value(state.play(cell), plies - 1) for cell in state.legal_moves()]
+    wins = [v for v in values if v and v % 2 == 0]             # moves to positions the opponent loses
+    if wins:
+        return min(wins) + 1 if min(wins) + 1 <= plies else 0
+    if all(v % 2 == 1 for v in values):                        # every move lets the opponent win
+        return max(values) + 1 if max(values) + 1 <= plies else 0
+    return 0
+
+
+@pytest.fixture
+def values(monkeypatch):
+    """An all-unsolved table for the workers' code (calloc'd, so only the pages that are touched are allocated)"""
+    table = np.zeros(TOTAL_STATES, dtype=np.uint8)
+    monkeypatch.setattr(solver, "_values", table)
+    return table
+
+
+def test_first_pass_labels_immediate_wins(values):
+    rng = random.Random(3)
+    for seg in SEGMENTS:
+        size = min(2048, SEGMENT_SIZE[seg])
+        start = rng.randrange(SEGMENT_SIZE[seg] - size + 1)
+        examined, labelled, _ = solver._solve_chunk((seg, start, start + size, 1))
+        assert examined == size
+        chunk = values[SEGMENT_OFFSET[seg] + start:SEGMENT_OFFSET[seg] + start + size]
+        expected = [immediate_win(index_state(SEGMENT_OFFSET[seg] + start + i)) for i in range(size)]
+        assert (chunk == 1).tolist() == expected
+        assert labelled == sum(expected)
+
+
+def search_score(state):
+    searcher = Searcher(max_depth=MAX_PLY, time_budget_ms=60_000, draw_rule=DrawRule(repetitions=0, max_moves=0))
+    return searcher.search(state).score
+
+
+def search_label(score):
+    """The solver's label for a negamax score (0 when no result is forced within MAX_PLY plies)"""
+    return WIN_SCORE - abs(score) if abs(score) >= WIN_SCORE - MAX_PLY else 0
+
+
+def sample_positions(per_label, seed):
+    """
+    Positions reached by random play, 'per_label' for each label from 0 to MAX_PLY: short forced results are rare in
+    random positions, so they are collected (sorted by a quick search) until each label has its share.
+    """
+    rng = random.Random(seed)
+    buckets = {label: [] for label in range(MAX_PLY + 1)}
+    while any(len(bucket) < per_label for bucket in buckets.values()):
+        state = State()
+        for _ in range(rng.randrange(4, 24)):
+            cell = rng.choice(state.legal_moves())
+            if completes_line(state.play(cell).mask(state.turn), cell):
+                break
+            state = state.play(cell)
+        bucket = buckets[search_label(search_score(state))]
+        if len(bucket) < per_label:
+            bucket.append(state)
+    return [state for bucket in buckets.values() for state in bucket]
+
+
+def test_truncated_solve_matches_search(values):
+    """
+    Solve each position for MAX_PLY plies with the solver's own passes (its successors labelled by the plain recursion)
+    and compare the label with the recursion and with negamax searched MAX_PLY plies deep.
+    """
+    for state in sample_positions(4, seed=4):
+        index = state_index(state)
+        seg = segment_of(index)
+        position = index - SEGMENT_OFFSET[seg]
+
+        children = {}
+        for cell in state.legal_moves():
+            child = state.play(cell)
+            if not completes_line(child.mask(state.turn), cell):
+                children[state_index(child)] = truncated_value(child, MAX_PLY - 1)
+
+        values[index] = 0
+        for ply in range(1, MAX_PLY + 1):
+            # successors hold the labels that the earlier passes of a full solve would have given them
+            for child_index, child_label in children.items():
+                values[child_index] = child_label if child_label < ply else 0
+            solver._solve_chunk((seg, position, position + 1, ply))
+        label = int(values[index])
+        assert label == truncated_value(state, MAX_PLY)
+
+        score = search_score(state)
+        if label == 0:
+            assert abs(score) < WIN_SCORE - MAX_PLY
+        elif label % 2 == 1:
+            assert score == WIN_SCORE - label
+        else:
+            assert score == -(WIN_SCORE - label)
+
+        values[index] = 0
+        values[list(children)] = 0
@@ -0,0 +1,104 @@
+"""State (packed FIFO, 39-bit key, incremental Zobrist hash) against a plain list-based board"""
+
+import random
+
+import pytest
+
+from engine import zobrist as Z
+from engine.board import LINES, MAX_MARKS, SIZE
+from engine.core import DrawRule, GameEngine
+from engine.state import State
+
+
+class ReferenceGame:
+    """The rules as the original TicTacToe_GAME kept them: a list of (row, col) per player, oldest first"""
+    def __init__(self):
+        self.player_move = {1: [], 2: []}
+        self.current_player = 1
+        self.winner = None
+
+    def make_move(self, row, col):
+        player = self.current_player
+        moves = self.player_move[player]
+        moves.append((row, col))
+        if len(moves) > MAX_MARKS:
+            moves.pop(0)
+        cells = {r * SIZE + c for r, c in moves}
+        if any(all(cell in cells for cell in line) for line in LINES):
+            self.winner = player
+        self.current_player = 3 - player
+
+    def canva(self, mark_expiring=True):
+        canva = [[0] * SIZE for _ in range(SIZE)]
+        for player, moves in self.player_move.items():
+            for row, col in moves:
+                canva[row][col] = player
+            if mark_expiring and len(moves) == MAX_MARKS:
+                row, col = moves[0]
+                canva[row][col] = -player
+        return canva
+
+    def free_cells(self):
+        taken = {r * SIZE + c for moves in self.player_move.values() for r, c in moves}
+        return [cell for cell in range(SIZE * SIZE) if cell not in taken]
+
+
+def random_games(count, seed=0, max_moves=60):
+    """Yield (reference, state) after every move of 'count' random games"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        reference, state = ReferenceGame(), State()
+        for _ in range(max_moves):
+            cell = rng.choice(reference.free_cells())
+            reference.make_move(*divmod(cell, SIZE))
+            state = state.play(cell)
+            yield reference, state
+            if reference.winner:
+                break
+
+
+def test_play_matches_reference():
+    for reference, state in random_games(300):
+        assert state.player_move() == {p: [r * SIZE + c for r, c in reference.player_move[p]] for p in (1, 2)}
+        assert state.to_canva() == reference.canva()
+        assert state.to_canva(mark_expiring=False) == reference.canva(mark_expiring=False)
+        assert state.turn == reference.current_player
+        assert state.occupied == sum(1 << cell for cell in range(SIZE * SIZE) if cell not in reference.free_cells())
+
+
+def test_key_round_trip():
+    seen = {}
+    for _, state in random_games(300, seed=1):
+        key = state.key
+        assert key < 1 << 39
+        again = State.from_key(key)
+        assert again == state
+        assert (again.m1, again.m2, again.q1, again.q2, again.n1, again.n2, again.turn) == \
+               (state.m1, state.m2, state.q1, state.q2, state.n1, state.n2, state.turn)
+        # different positions never share a key
+        assert seen.setdefault(key, state.player_move()) == state.player_move()
+
+
+def test_incremental_zobrist_matches_full_hash():
+    for _, state in random_games(300, seed=2):
+        expected = Z.hash_moves(1, state.moves(1)) ^ Z.hash_moves(2, state.moves(2)) ^ (Z.TURN if state.turn == 2 else 0)
+        assert state.zobrist == expected
+        assert State.from_key(state.key).zobrist == state.zobrist
+
+
+def test_from_canva_round_trip():
+    for _, state in random_games(100, seed=3):
+        player_move = {p: [divmod(cell, SIZE) for cell in state.moves(p)] for p in (1, 2)}
+        assert State.from_canva(state.to_canva(), player_move, state.turn) == state
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_engine_winner_matches_reference(seed):
+    rng = random.Random(seed)
+    for _ in range(200):
+        reference, engine = ReferenceGame(), GameEngine(draw_rule=DrawRule(repetitions=0, max_moves=0))
+        while not reference.winner and engine.moves_played < 60:
+            cell = rng.choice(reference.free_cells())
+            reference.make_move(*divmod(cell, SIZE))
+            assert engine.apply_move(cell) == reference.winner
+        assert engine.is_over == bool(reference.winner)
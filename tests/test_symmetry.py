@@ -0,0 +1,94 @@
+"""The eight board symmetries, and the round trip of a move through the canonical frame (as ai_player's position cache does it)"""
+
+import random
+
+from engine.board import LINE_MASKS, SIZE
+from engine.state import State
+from engine.symmetry import (INVERSE, TRANSFORMS, canonical, canonical_key, image_key, transform_cell,
+                             transform_state)
+
+
+CELLS = SIZE * SIZE
+
+
+def won(state):
+    return any(state.mask(player) & mask == mask for player in (1, 2) for mask in LINE_MASKS)
+
+
+def random_states(count, seed=0, max_moves=40):
+    """Every position of 'count' random games (wins included)"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        state = State()
+        for _ in range(rng.randrange(1, max_moves)):
+            state = state.play(rng.choice(state.legal_moves()))
+            yield state
+            if won(state):
+                break
+
+
+def test_transforms_are_distinct_bijections():
+    assert TRANSFORMS[0] == tuple(range(CELLS))
+    assert len(set(TRANSFORMS)) == 8
+    for t, cells in enumerate(TRANSFORMS):
+        assert sorted(cells) == list(range(CELLS)), t
+        for cell in range(CELLS):
+            assert transform_cell(transform_cell(cell, t), INVERSE[t]) == cell
+            assert transform_cell(transform_cell(cell, INVERSE[t]), t) == cell
+
+
+def test_transforms_form_a_group():
+    for a in TRANSFORMS:
+        for b in TRANSFORMS:
+            assert tuple(b[a[cell]] for cell in range(CELLS)) in TRANSFORMS
+
+
+def test_image_keeps_marks_and_ages():
+    for state in random_states(50, seed=1):
+        for t, cells in enumerate(TRANSFORMS):
+            image = transform_state(state, t)
+            assert image.key == image_key(state, t)
+            assert image.turn == state.turn
+            for player in (1, 2):
+                # oldest first, so the next mark to disappear is the image of the original one
+                assert image.moves(player) == [cells[cell] for cell in state.moves(player)]
+
+
+def test_canonical_is_invariant_over_the_orbit():
+    for state in random_states(100, seed=2):
+        key, t = canonical_key(state)
+        assert key == min(image_key(state, u) for u in range(len(TRANSFORMS)))
+        assert transform_state(state, t).key == key
+        assert canonical(state) == (State.from_key(key), t)
+        for u in range(len(TRANSFORMS)):
+            image = transform_state(state, u)
+            assert canonical_key(image)[0] == key
+            assert transform_state(image, canonical_key(image)[1]).key == key
+
+
+def test_moves_commute_with_transforms():
+    for state in random_states(50, seed=3):
+        if won(state):
+            continue
+        for cell in state.legal_moves():
+            for t in range(len(TRANSFORMS)):
+                assert transform_state(state, t).play(transform_cell(cell, t)) == transform_state(state.play(cell), t)
+
+
+def test_move_goes_back_to_the_right_frame():
+    """A move cached in the canonical frame from one position replays as the same move in every symmetric position"""
+    for state in random_states(50, seed=4):
+        if won(state):
+            continue
+        key, t = canonical_key(state)
+        for cell in state.legal_moves():
+            cached = transform_cell(cell, t)
+            after = canonical_key(state.play(cell))[0]
+            for u in range(len(TRANSFORMS)):
+                image = transform_state(state, u)
+                image_canonical, image_t = canonical_key(image)
+                assert image_canonical == key
+                move = transform_cell(cached, INVERSE[image_t])
+                assert move in image.legal_moves()
+                # a position with its own symmetries may map the move to an equivalent cell, so compare the results
+                assert canonical_key(image.play(move))[0] == after
@@ -0,0 +1,178 @@
+"""SolvedTable lookups on the full and compact formats against search, compact(), and open_table's caching"""
+
+import random
+
+import numpy as np
+import pytest
+
+from engine import solver
+from engine.board import completes_line
+from engine.core import DrawRule
+from engine.index import SEGMENT_OFFSET, SEGMENT_SIZE, TOTAL_STATES, index_state, state_index
+from engine.search import Searcher, WIN_SCORE
+from engine.state import State
+from engine.symmetry import TRANSFORMS, canonical_index, transform_state
+from engine.table import COMPACT_VERSION, HEADER, HEADER_SIZE, MAGIC, VERSION, SolvedTable, open_table
+
+
+MAX_PLY = 4
+
+
+def write_full_table(path, values, longest=MAX_PLY):
+    """A full table of 'values' ({index: value}), draws elsewhere (a sparse file: only the values are written)"""
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, longest, TOTAL_STATES).ljust(HEADER_SIZE, b"\0"))
+        f.truncate(HEADER_SIZE + TOTAL_STATES)
+        for index, value in values.items():
+            f.seek(HEADER_SIZE + index)
+            f.write(bytes([value]))
+
+
+def write_compact_table(path, values=None, longest=1):
+    """A compact table of 'values' ({canonical index: value}); by default a single (canonical index 0, draw) entry"""
+    values = values or {0: 0}
+    indices = sorted(values)
+    header = HEADER.pack(MAGIC, COMPACT_VERSION, longest, len(indices)).ljust(HEADER_SIZE, b"\0")
+    path.write_bytes(header + np.array(indices, dtype=np.uint32).tobytes() + bytes(values[i] for i in indices))
+
+
+# * -------------------------------------------------------------------------------
+# * Known positions: short forced results, labelled by search
+
+def search_label(state):
+    """The table's value of 'state' if search finds a forced result within MAX_PLY plies, else 0"""
+    searcher = Searcher(max_depth=MAX_PLY, time_budget_ms=60_000, draw_rule=DrawRule(repetitions=0, max_moves=0))
+    score = searcher.search(state).score
+    if abs(score) < WIN_SCORE - MAX_PLY:
+        return 0
+    return WIN_SCORE - abs(score)
+
+
+def known_positions(per_label, seed):
+    """Positions reached by random play, 'per_label' for each forced result from 1 to MAX_PLY plies"""
+    rng = random.Random(seed)
+    buckets = {label: [] for label in range(1, MAX_PLY + 1)}
+    while any(len(bucket) < per_label for bucket in buckets.values()):
+        state = State()
+        for _ in range(rng.randrange(6, 24)):
+            cell = rng.choice(state.legal_moves())
+            if completes_line(state.play(cell).mask(state.turn), cell):
+                break
+            state = state.play(cell)
+        label = search_label(state)
+        if label and len(buckets[label]) < per_label:
+            buckets[label].append(state)
+    return [(state, label) for label, bucket in buckets.items() for state in bucket]
+
+
+def successors(state):
+    """Positions after each move of 'state' that does not win on the spot"""
+    moves = ((cell, state.play(cell)) for cell in state.legal_moves())
+    return [child for cell, child in moves if not completes_line(child.mask(state.turn), cell)]
+
+
+@pytest.fixture(scope="module")
+def known():
+    """
+    The known positions and their successors, labelled by search: the forced results within MAX_PLY plies are exact,
+    and a successor that is not a known result is stored as a draw, which never beats the best move's value.
+    """
+    positions = known_positions(2, seed=5)
+    labels = {state: label for state, label in positions}
+    for state, _ in positions:
+        for child in successors(state):
+            labels.setdefault(child, search_label(child))
+    return positions, labels
+
+
+@pytest.fixture(scope="module", params=["full", "compact"])
+def table(request, known, tmp_path_factory):
+    _, labels = known
+    path = tmp_path_factory.mktemp("table") / "solved.bin"
+    if request.param == "full":
+        # every image of a position has its value, as in a solved table
+        write_full_table(path, {state_index(transform_state(state, t)): label
+                                for state, label in labels.items() for t in range(len(TRANSFORMS))})
+    else:
+        write_compact_table(path, {canonical_index(state): label for state, label in labels.items()}, longest=MAX_PLY)
+    table = SolvedTable(str(path))
+    yield table
+    table.close()
+
+
+def test_value_matches_search(table, known):
+    positions, _ = known
+    for state, label in positions:
+        for t in range(len(TRANSFORMS)):
+            image = transform_state(state, t)
+            assert table.value(image) == label, (image, t)
+            assert table.value(image.key) == label
+
+
+def test_best_move_matches_search(table, known):
+    positions, _ = known
+    for state, label in positions:
+        for t in range(len(TRANSFORMS)):
+            image = transform_state(state, t)
+            cell = table.best_move(image)
+            assert cell in image.legal_moves()
+            child = image.play(cell)
+            if label == 1:
+                assert completes_line(child.mask(image.turn), cell)
+            else:
+                # the fastest win, or the slowest loss: the opponent faces the result one ply shorter
+                assert search_label(child) == label - 1, (image, cell)
+
+
+def test_missing_entry(tmp_path):
+    path = tmp_path / "solved.bin"
+    write_compact_table(path)
+    table = SolvedTable(str(path))
+    assert table.value(State()) == 0
+    with pytest.raises(ValueError):
+        table.value(State().play(0))
+    table.close()
+
+
+# * -------------------------------------------------------------------------------
+# * compact()
+
+# the first segments (a few ten thousand positions) stand in for the whole index
+SMALL = ((0, 0), (0, 1), (1, 1), (1, 2), (2, 2))
+
+
+def test_compact_keeps_one_position_per_class(tmp_path, monkeypatch):
+    positions = range(sum(SEGMENT_SIZE[seg] for seg in SMALL))
+    canonical = {index: canonical_index(index_state(index)) for index in positions}
+    # any value that is the same over a symmetry class, as a solved one is
+    full = {index: canonical[index] % 9 + 1 for index in positions}
+
+    source, output = tmp_path / "solved.bin", tmp_path / "solved-compact.bin"
+    write_full_table(source, full)
+    monkeypatch.setattr(solver, "SEGMENTS", SMALL)
+    kept = solver.compact(str(source), str(output), chunk_size=4096, log=lambda line: None)
+    assert kept == len(set(canonical.values()))
+    assert not (tmp_path / "solved-compact.bin.values").exists()
+
+    table = SolvedTable(str(output))
+    assert (table.version, table.count, table.longest) == (COMPACT_VERSION, kept, MAX_PLY)
+    assert table._indices.tolist() == sorted(set(canonical.values()))
+    for index in positions:
+        assert table.value(index_state(index)) == full[index]
+    with pytest.raises(ValueError):
+        table.value(index_state(SEGMENT_OFFSET[(2, 3)]))
+    table.close()
+
+
+# * -------------------------------------------------------------------------------
+# * open_table
+
+def test_missing_table_is_not_cached(tmp_path):
+    path = tmp_path / "solved.bin"
+    assert open_table(str(path)) is None
+
+    write_compact_table(path)
+    table = open_table(str(path))
+    assert isinstance(table, SolvedTable)
+    assert table.version == COMPACT_VERSION and table.count == 1
+    assert open_table(str(path)) is table
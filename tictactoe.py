@@ -2,7 +2,14 @@ import streamlit as st
 import numpy as np
 import time
 
+from engine.core import GameEngine
+from engine.board import to_cell, to_coords
+from engine.history import MoveLog
+
 def initialize_session_state():
+    if "engine" not in st.session_state:
+        st.session_state['engine'] = GameEngine()
+
     if "game_state" not in st.session_state:
         st.session_state['game_state'] = np.array([
             [0, 0, 0, 0],
@@ -15,10 +22,7 @@ def initialize_session_state():
         st.session_state['player_move'] = {1: [], 2: []}
 
     if "game_history" not in st.session_state:
-        st.session_state['game_history'] = {
-            "canva": [],
-            "move": []
-        }
+        st.session_state['game_history'] = MoveLog()
 
     if "current_player" not in st.session_state:
         st.session_state['current_player'] = 1
@@ -26,6 +30,9 @@ def initialize_session_state():
     if "winner" not in st.session_state:
         st.session_state['winner'] = None
 
+    if "game_over" not in st.session_state:
+        st.session_state['game_over'] = False
+
     if "disabled" not in st.session_state:
         st.session_state['disabled'] = np.array([
             [False, False, False, False],
@@ -73,79 +80,47 @@ class TicTacToe_GAME:
             [True, True, True, True],
             [True, True, True, True]
         ])
-    
-
-    def disable_button(self, row, col):
-        st.session_state['disabled'][row, col] = True
 
-    def remove_oldest_move(self, player):
-        
-        if len(st.session_state['player_move'][player]) > 4:
-            st.session_state['game_state'][st.session_state['player_move'][player][0]] = 0
-            st.session_state['disabled'][st.session_state['player_move'][player][0]] = False
-            st.session_state['player_move'][player].pop(0)
+    @property
+    def engine(self):
+        return st.session_state['engine']
 
-        if len(st.session_state['player_move'][player]) == 4:
-            st.session_state['game_state'][st.session_state['player_move'][player][0]] = -1 * player
-            
-
-    def check_win(self):
-        for i in range(4):
-            # * check horizontal and vertical lines
-            row_i = st.session_state['game_state'][i]
-            col_i = st.session_state['game_state'][:, i]
-            
-            if all(row_i == [1, 1, 1, 1]) or all(col_i == [1, 1, 1, 1]):
-                st.session_state['winner'] = 1
-            elif all(row_i == [2, 2, 2, 2]) or all(col_i == [2, 2, 2, 2]):
-                st.session_state['winner'] = 2
-        
-        # * check diagnoal
-        diag = np.diag(st.session_state['game_state'])
-        inverse_diag = np.diag(st.session_state['game_state'][::-1])
-        if all(diag == [1, 1, 1, 1]) or all(inverse_diag == [1, 1, 1, 1]):
-            st.session_state['winner'] = 1
-        elif all(diag == [2, 2, 2, 2]) or all(inverse_diag == [2, 2, 2, 2]):
-            st.session_state['winner'] = 2
-
-        if st.session_state['winner']:
-            st.balloons()
+    def sync_session_state(self):
+        """Mirror the engine state into the session keys read by the UI and the AI player"""
+        engine = st.session_state['engine']
+        st.session_state['game_state'] = np.array(engine.to_board())
+        st.session_state['player_move'] = {
+            player: [to_coords(cell) for cell in moves] for player, moves in engine.player_move.items()
+        }
+        st.session_state['current_player'] = engine.current_player
+        st.session_state['winner'] = engine.winner
+        st.session_state['game_over'] = engine.is_over
+        st.session_state['disabled'] = st.session_state['game_state'] != 0
 
 
-    def append_to_history(self, move: tuple):
-        st.session_state['game_history']['canva'].append(st.session_state['game_state'].copy())
-        st.session_state['game_history']['move'].append(
-            (st.session_state['current_player'], move))
+    def append_to_history(self, player: int, move: tuple):
+        """Log the move; boards are rebuilt from the log when the history is replayed"""
+        st.session_state['game_history'].record(to_cell(*move), over=st.session_state['game_over'])
 
 
     def make_move(self, row, col, player):
-        # make a move
-        st.session_state['game_state'][row, col] = player
-        
+        engine = st.session_state['engine']
+        if player != engine.current_player:
+            raise ValueError(f"It is not player {player}'s turn.")
 
-        # disable the button
-        self.disable_button(row, col)
+        # the engine applies the rules (placement, removal of the oldest mark, win check)
+        winner = engine.apply_move(to_cell(row, col))
+        self.sync_session_state()
 
-        
-
-        # check win status
-        self.check_win()
-
-        if st.session_state['winner']:
+        if winner:
+            self.end_game()
+            st.balloons()
+        elif engine.draw:
             self.end_game()
-
-        else:
-            # append player move history if game not ended
-            st.session_state['player_move'][player].append((row, col))
-
-            # change player
-            st.session_state['current_player'] = 3 - player
-
-        # remove the oldest move (if the history move > 4)
-        self.remove_oldest_move(player)
 
         # append to history
-        self.append_to_history((row, col))
+        self.append_to_history(player, (row, col))
+        return winner
         
 
     def main(self):
@@ -171,18 +146,25 @@ class TicTacToe_GAME:
         
         if st.session_state['winner']:
             st.success(f"**Player {st.session_state['winner']} wins!**")
+        elif st.session_state['game_over']:
+            st.info("**Draw!** The same position came up too often, or the move limit was reached.")
 
     @st.fragment        
     def render_history(self):
 
-        i = st.slider("Move", min_value = 1, max_value = len(st.session_state['game_history']['canva']), value = 1) - 1
+        log = st.session_state['game_history']
+        i = st.slider("Move", min_value = 1, max_value = len(log), value = 1) - 1
 
-        history = st.session_state['game_history']['canva'][i]
-        player_move = st.session_state['game_history']['move'][i]
+        history = log.board(i)
+        player_move = log.move(i)
 
-        st.info(f"Player {player_move[0]} selected {player_move[1]}")
-        if i >= len(st.session_state['game_history']['canva']) - 1:
-            st.success(f"Player {st.session_state['current_player']} won the game!")
+        st.info(f"Player {player_move[0]} selected {player_move[1]}"
+                + (", and their oldest mark was removed" if log.expired(i) else ""))
+        if i >= len(log) - 1:
+            if st.session_state['winner']:
+                st.success(f"Player {st.session_state['winner']} won the game!")
+            else:
+                st.info("The game ended in a draw.")
 
         
         
@@ -191,7 +173,7 @@ class TicTacToe_GAME:
                 COLS = st.columns(4)
             for col in range(4):
                 with COLS[col]:
-                    st.button(f"{self.get_cell_content(history[row, col])}", 
+                    st.button(f"{self.get_cell_content(history[row][col])}", 
                             key = f"{i}:{row}_{col}_manual", 
                             disabled = True)
         
@@ -1,19 +1,217 @@
 import streamlit as st
-import pandas as pd
+import queue
+import threading
 import time
 import datetime as dt
+import gc
+import importlib
 import json
-from typing import List, Callable, Dict, Any, Tuple, Optional
+import os
+import sys
+import tempfile
+import weakref
+from array import array
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from config import MEMORY_PAGE_SIZE, TRANSCRIPT_TAIL_ROWS, TRANSCRIPT_DIR, GC_FREEZE
+from types import ModuleType
+from typing import List, Callable, Dict, Any, Tuple, Optional, Iterable, TYPE_CHECKING
 
-def stream_data(msg: str):
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def stream_data(msg: str | Iterable[str]):
     """
     Generator that enables streaming writing
-    :param msg: text message
+    :param msg: text message, or an iterable of text chunks (e.g. LLM deltas) that are passed on as they arrive
     """
+    if not isinstance(msg, str):
+        yield from msg
+        return
     for word in msg.split(" "):
         yield word + " "
         time.sleep(0.01)
 
+
+_RESET = object()
+
+
+class TextStream:
+    """
+    Text chunks written by the agent loop and shown by st.write_stream in a helper thread,
+    so rendering never blocks the event loop that receives the LLM stream.
+    """
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._closed = False
+
+    def _segment(self):
+        """Chunks up to the next reset or the end of the stream"""
+        while True:
+            chunk = self._queue.get()
+            if chunk is None or chunk is _RESET:
+                self._closed = chunk is None
+                return
+            yield chunk
+
+    def _show(self, placeholder) -> None:
+        # each segment replaces the previous one in the placeholder
+        while not self._closed:
+            placeholder.write_stream(stream_data(self._segment()))
+
+    def put(self, text: str) -> None:
+        self._queue.put(text)
+
+    def reset(self) -> None:
+        """Clear the text shown so far (e.g. the partial answer of a failed LLM attempt)"""
+        self._queue.put(_RESET)
+
+    def start(self) -> "TextStream":
+        """Start showing the stream below the current element"""
+        placeholder = st.empty()
+        self._thread = threading.Thread(target=self._show, args=(placeholder,), daemon=True)
+        add_script_run_ctx(self._thread, get_script_run_ctx())
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """End the stream and wait until it is fully shown"""
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+class MemoryTable:
+    """
+    Global memory (the agents' transcript) as an append-only columnar buffer, one list per displayed column.
+
+    Rows are formatted to plain data once, when they are added, so showing a page costs the same however long the
+    transcript is. Only the newest 'max_rows' rows stay in memory: older ones are spilled, half a tail at a time, to an
+    append-only JSONL file, which is read back by 'rows' and 'page' through a sparse index of line offsets.
+    Rows arrive in time order, so the table is always sorted by time.
+
+    :param max_rows: rows kept in memory
+    :param directory: directory of the spill file (None: the system temporary directory); the file is removed with the table
+    """
+    COLUMNS = ("agent_session", "role", "content", "tool_calls", "time_on_display")
+    INDEX_STRIDE = 64            # a file offset is kept for every INDEX_STRIDE-th spilled row
+
+    def __init__(self, max_rows: int = TRANSCRIPT_TAIL_ROWS, directory: str | None = TRANSCRIPT_DIR):
+        self.columns: Dict[str, List] = {name: [] for name in self.COLUMNS}
+        self.max_rows = max(2, max_rows)
+        self.directory = directory
+        self.spilled = 0                     # rows in the file (row numbers before the in-memory tail)
+        self._offsets = array("Q")           # offset of spilled rows 0, INDEX_STRIDE, 2 * INDEX_STRIDE, ...
+        self._file = None
+        self._lock = threading.Lock()        # the agent loop may append while the UI reads
+
+    def __len__(self) -> int:
+        return self.spilled + len(self.columns["role"])
+
+    def append(self, agent_name: str, memory: dict) -> None:
+        content, timestamp = memory.get("content", None), memory.get("time", None)
+        row = {
+            "agent_session": agent_name,
+            "role": memory.get("role", None),
+            "content": format_message(content) if isinstance(content, str) else content,
+            "tool_calls": format_tool_calls(memory.get("tool_calls", None)),
+            "time_on_display": dt.datetime.fromtimestamp(float(timestamp)).strftime("%Y-%m-%d %H:%M:%S") if timestamp else None,
+        }
+        with self._lock:
+            for name, value in row.items():
+                self.columns[name].append(value)
+            if len(self.columns["role"]) >= self.max_rows:
+                self._spill(self.max_rows // 2)
+
+    def _spill(self, count: int) -> None:
+        """Move the oldest 'count' in-memory rows to the end of the spill file"""
+        if self._file is None:
+            self._file = tempfile.NamedTemporaryFile(mode="a+b", prefix="transcript-", suffix=".jsonl",
+                                                     dir=self.directory, delete=False)
+            weakref.finalize(self, _remove_file, self._file)
+        self._file.seek(0, os.SEEK_END)
+        offset = self._file.tell()
+        lines = []
+        for i in range(count):
+            line = json.dumps({name: values[i] for name, values in self.columns.items()}, ensure_ascii=False) + "\n"
+            if (self.spilled + i) % self.INDEX_STRIDE == 0:
+                self._offsets.append(offset)
+            line = line.encode("utf-8")
+            offset += len(line)
+            lines.append(line)
+        self._file.write(b"".join(lines))
+        self._file.flush()
+        for values in self.columns.values():
+            del values[:count]
+        self.spilled += count
+
+    def _read_spilled(self, start: int, stop: int) -> List[Dict]:
+        """Spilled rows [start, stop), read from the nearest indexed offset"""
+        block = start // self.INDEX_STRIDE
+        self._file.seek(self._offsets[block])
+        for _ in range(start - block * self.INDEX_STRIDE):
+            self._file.readline()
+        return [json.loads(self._file.readline()) for _ in range(stop - start)]
+
+    def rows(self, start: int, stop: int) -> List[Dict]:
+        """Rows [start, stop) as dicts, from the spill file and the in-memory tail (e.g. for debugging)"""
+        with self._lock:
+            stop = min(stop, len(self))
+            start = max(0, min(start, stop))
+            rows = self._read_spilled(start, min(stop, self.spilled)) if start < self.spilled else []
+            tail_start, tail_stop = max(start - self.spilled, 0), max(stop - self.spilled, 0)
+            rows += [dict(zip(self.COLUMNS, values))
+                     for values in zip(*(self.columns[name][tail_start:tail_stop] for name in self.COLUMNS))]
+            return rows
+
+    def page(self, start: int, stop: int) -> "pd.DataFrame":
+        """Rows [start, stop) as a DataFrame indexed by row number"""
+        pd = lazy_import("pandas")      # not at startup: only once the Memory tab has rows
+        rows = self.rows(start, stop)
+        return pd.DataFrame(rows, columns=list(self.COLUMNS), index=range(start, start + len(rows)))
+
+
+def _remove_file(file) -> None:
+    file.close()
+    os.remove(file.name)
+
+
+def freeze_long_lived_objects() -> None:
+    """
+    Move the objects created so far (imported modules, the engine tables...) out of the garbage collector's reach.
+    They live as long as the server, and Streamlit runs a full collection after every script or fragment run, which
+    otherwise walks all of them. Does nothing unless config.GC_FREEZE is set.
+    """
+    if not GC_FREEZE:
+        return
+    gc.collect()
+    gc.freeze()
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a heavy module when a feature first needs it instead of at startup, and freeze the objects it created
+    (see freeze_long_lived_objects). Later calls return the loaded module.
+    """
+    loaded = name in sys.modules
+    module = importlib.import_module(name)     # waits if another thread is still importing it
+    if not loaded:
+        freeze_long_lived_objects()
+    return module
+
+
+@st.cache_resource(show_spinner=False)
+def freeze_startup_objects() -> None:
+    """Freeze the objects created by the app's imports, once per process"""
+    freeze_long_lived_objects()
+
+
+def rerun_fragment() -> None:
+    """Rerun the running fragment; when it runs as part of a full app run (e.g. the first run), rerun the app"""
+    ctx = get_script_run_ctx()
+    st.rerun(scope = "fragment" if ctx is not None and ctx.fragment_ids_this_run else "app")
+
+
 def add_global_memory(agent_name: str, memory: dict | Any) -> None:
     """
     Handle global memory for all agents. This would be stored in the st.session_state object
@@ -22,17 +220,9 @@ def add_global_memory(agent_name: str, memory: dict | Any) -> None:
     :param memory: the memory object to be stored. (a dictionary)
     """
     if "global_memory" not in st.session_state:
-        st.session_state["global_memory"] = []
-        
-    
-    st.session_state['global_memory'].append(
-        {"agent_session": agent_name, 
-            "role": memory.get("role", None),
-            "content": memory.get("content", None),
-            "tool_calls": memory.get("tool_calls", None),
-            "time": memory.get("time", None)
-        }
-    )
+        st.session_state["global_memory"] = MemoryTable()
+
+    st.session_state['global_memory'].append(agent_name, memory)
 
 def format_message(message: str):
     """
@@ -45,8 +235,11 @@ def format_message(message: str):
     if not (message.startswith("{") and message.endswith("}")):
         return message
     
-    # otherwide load it as a json object -> dict
-    body = json.loads(message)
+    # otherwide load it as a json object -> dict (an LLM reply may only look like one, e.g. '{row: 1}')
+    try:
+        body = json.loads(message)
+    except json.JSONDecodeError:
+        return message
 
     # return eigher 'message' or 'result' 
     # * message comes when the agent return text, and result comes when the agent implements a tool call
@@ -67,8 +260,9 @@ def format_tool_calls(messages: Any):
         return 
     value = ""
     for message in messages:
-        tool_name = message.function.name
-        tool_args = message.function.arguments
+        function = message["function"] if isinstance(message, dict) else message.function
+        tool_name = function["name"] if isinstance(function, dict) else function.name
+        tool_args = function["arguments"] if isinstance(function, dict) else function.arguments
         value += "> " + tool_name + ": " + tool_args + "\n"
     return value
 
@@ -76,26 +270,22 @@ def format_tool_calls(messages: Any):
 
 
 
+@st.fragment
 def render_global_memory():
     """
-    A dialog window that shows global memory.
-
-    This function use 'format_message' and 'format_tool_calls' functions
+    Show the global memory, one page of MEMORY_PAGE_SIZE rows at a time (the newest page by default).
+    The rows are formatted when they are added (see MemoryTable), so a rerun only slices the current page.
     """
-    if not st.session_state['global_memory']:
+    table = st.session_state['global_memory']
+    if not len(table):
         st.error("No memory yet!")
     else:
-        df = pd.DataFrame(st.session_state['global_memory'])
-        df['time_on_display'] = df['time'].apply(lambda x: dt.datetime.fromtimestamp(float(x)).strftime("%Y-%m-%d %H:%M:%S"))
-
-        df['content'] = df['content'].apply(lambda x: format_message(x))
-        df['tool_calls'] = df['tool_calls'].apply(lambda x: format_tool_calls(x))
-
-        st.dataframe(df.sort_values(by = "time", ascending = True),
-            column_config = {
-                "time": None
-            }
-        )
+        pages = -(-len(table) // MEMORY_PAGE_SIZE)
+        page = pages
+        if pages > 1:
+            page = st.number_input("Page", min_value = 1, max_value = pages, value = pages)
+        start = (page - 1) * MEMORY_PAGE_SIZE
+        st.dataframe(table.page(start, start + MEMORY_PAGE_SIZE))
 
 
 def render_sidebar():
@@ -115,6 +305,8 @@ def render_sidebar():
             # only show AI-related setting when the user plays with AI
             if st.session_state['play_mode'] == "Play with AI":
                 st.session_state['difficulty'] = st.selectbox("Difficulty", ['easy', 'medium', 'hard'])
+                st.session_state['ai_backend'] = st.selectbox("AI engine", ['LLM', 'Search'], 
+                                                              help = "LLM: the language-model agent. Search: a local game-tree search whose depth follows the difficulty.")
                 st.session_state['debug_mode'] = st.pills("Debug mode", [True, False], format_func = lambda x: "On" if x else "Off", default = False)
                 st.caption("Note: **Player 2** is always **AI**.")
             